@@ -1,6 +1,4 @@
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
-from langchain_huggingface import HuggingFaceEndpointEmbeddings
 from langchain_core.runnables import RunnableParallel, RunnablePassthrough, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
 from langchain_community.vectorstores import FAISS
@@ -9,17 +7,12 @@ from youtube_transcript_api import YouTubeTranscriptApi,TranscriptsDisabled
 from dotenv import load_dotenv
 from pytube import YouTube
 
+from chatmodels.model_registry import get_chat_model, get_embeddings, prefetch
+
 
 load_dotenv()
 
-embeddings = HuggingFaceEndpointEmbeddings(
-    repo_id="BAAI/bge-m3"
-)
-llm = HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-4-Scout-17B-16E-Instruct",
-    task="text-generation"
-)
-model = ChatHuggingFace(llm=llm)
+prefetch("meta-llama/Llama-4-Scout-17B-16E-Instruct") # langchain_huggingface is imported while the url is typed
 
 video_id = YouTube(input("Enter the url ")).video_id
 
@@ -38,6 +31,7 @@ def output_formatter(docs):
 
 chunks = splitter.create_documents([text])
 
+embeddings = get_embeddings("BAAI/bge-m3")
 vector_store = FAISS.from_documents(chunks,embeddings)
 
 retriever = vector_store.as_retriever(search_type="similarity",search_kwargs={"k":4})
@@ -62,6 +56,7 @@ template = PromptTemplate(
 
 query = input("User: ")
 
+model = get_chat_model("meta-llama/Llama-4-Scout-17B-16E-Instruct")
 main_chain = parallel_chain | template | model | string_parser
 
 result = main_chain.invoke(query)
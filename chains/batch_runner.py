@@ -0,0 +1,181 @@
+from collections import Counter
+import argparse
+import asyncio
+import json
+import os
+import time
+
+def _to_json(obj):
+    # chain outputs may be pydantic models, messages or plain python values
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    return str(obj)
+
+def read_results(output_path):
+    """The output file as one record per input index, sorted by index. A retried record has several lines,
+    the last one wins, half written lines from a crash are skipped."""
+    results = {}
+    if not os.path.exists(output_path):
+        return []
+    with open(output_path, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            results[record["index"]] = record
+    return [results[index] for index in sorted(results)]
+
+def _compact(output_path):
+    """Rewrites the output file with one line per index, returns the number of lines dropped."""
+    results = read_results(output_path)
+    with open(output_path, "rb") as f:
+        lines = sum(1 for line in f if line.strip())
+    if lines == len(results):
+        return 0
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        for record in results:
+            f.write(json.dumps(record) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, output_path) # a crash leaves either the old file or the compacted one
+    return lines - len(results)
+
+def _read_checkpoint(output_path, retry_errors):
+    """Indices already present in the output file. The output file is the checkpoint, so a crash
+    loses at most the records that were in flight."""
+    done = {record["index"] for record in read_results(output_path) if record.get("error") is None or not retry_errors}
+    if os.path.exists(output_path):
+        with open(output_path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n") # next record must not be glued to a half written one
+    return done
+
+def _read_records(input_path, done):
+    with open(input_path) as f:
+        for index, line in enumerate(f):
+            if line.strip() and index not in done:
+                yield index, json.loads(line)
+
+async def arun_jsonl(chain, input_path, output_path, max_concurrency=8, retry_errors=True, report_every=50):
+    """Streams every JSONL record of `input_path` through `chain.ainvoke` with at most `max_concurrency`
+    calls in flight and appends {"index", "input", "output", "error"} lines to `output_path` as soon as
+    each record finishes. Records already in `output_path` are skipped, so rerunning resumes the batch.
+    At the end the file is compacted to one line per index, a retried record keeps only its latest result."""
+    done = _read_checkpoint(output_path, retry_errors)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    stats = Counter()
+    start = time.perf_counter()
+
+    with open(output_path, "a") as out:
+
+        async def process(index, record):
+            try:
+                try:
+                    output, error = await chain.ainvoke(record), None
+                except Exception as e:
+                    output, error = None, f"{type(e).__name__}: {e}"
+                out.write(json.dumps({"index": index, "input": record, "output": output, "error": error}, default=_to_json) + "\n")
+                out.flush()
+            finally:
+                semaphore.release()
+            stats["errors" if error else "ok"] += 1
+            if error:
+                stats[f"error:{error.split(':', 1)[0]}"] += 1
+            finished = stats["ok"] + stats["errors"]
+            if finished % report_every == 0:
+                print(f"{finished} done, {finished / (time.perf_counter() - start):.2f} records/s")
+
+        tasks = []
+        for index, record in _read_records(input_path, done):
+            await semaphore.acquire() # read the next record only when a slot is free
+            tasks.append(asyncio.create_task(process(index, record)))
+        await asyncio.gather(*tasks)
+        out.flush()
+        os.fsync(out.fileno())
+    compacted = _compact(output_path)
+
+    elapsed = time.perf_counter() - start
+    finished = stats["ok"] + stats["errors"]
+    report = {
+        "skipped_from_checkpoint": len(done),
+        "processed": finished,
+        "ok": stats["ok"],
+        "errors": stats["errors"],
+        "error_rate": stats["errors"] / finished if finished else 0.0,
+        "records_per_second": finished / elapsed if elapsed else 0.0,
+        "elapsed_seconds": elapsed,
+        "superseded_lines_removed": compacted,
+        "error_types": {k.split(":", 1)[1]: v for k, v in stats.items() if k.startswith("error:")}
+    }
+    return report
+
+def run_jsonl(chain, input_path, output_path, max_concurrency=8, retry_errors=True):
+    return asyncio.run(arun_jsonl(chain, input_path, output_path, max_concurrency, retry_errors))
+
+def check_retry_keeps_one_row_per_index():
+    """Runs a chain that fails every third record, then reruns it with the failures fixed: the output must
+    hold exactly one row per input, the successful retry and not the earlier error. Raises AssertionError."""
+    from langchain_core.runnables import RunnableLambda
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as folder:
+        input_path, output_path = os.path.join(folder, "in.jsonl"), os.path.join(folder, "out.jsonl")
+        with open(input_path, "w") as f:
+            f.writelines(json.dumps({"n": n}) + "\n" for n in range(30))
+
+        def flaky(record):
+            if record["n"] % 3 == 0:
+                raise ValueError("transient")
+            return record["n"] * 2
+
+        first = asyncio.run(arun_jsonl(RunnableLambda(flaky), input_path, output_path, report_every=10**9))
+        assert first["errors"] == 10 and first["ok"] == 20, first
+        with open(output_path, "a") as f:
+            f.write('{"index": 3, "inp') # a crash in the middle of a line
+        second = asyncio.run(arun_jsonl(RunnableLambda(lambda record: record["n"] * 2), input_path, output_path, report_every=10**9))
+        assert second["skipped_from_checkpoint"] == 20 and second["processed"] == 10, second
+        with open(output_path) as f:
+            rows = [json.loads(line) for line in f]
+        assert [row["index"] for row in rows] == list(range(30)), [row["index"] for row in rows]
+        assert all(row["error"] is None and row["output"] == 2 * row["input"]["n"] for row in rows)
+        assert read_results(output_path) == rows
+
+if __name__ == "__main__":
+    from langchain_core.output_parsers import JsonOutputParser
+    from langchain_core.prompts import PromptTemplate
+    from dotenv import load_dotenv
+
+    from chatmodels.model_registry import get_chat_model
+    from output_parsers.json_repair import RepairingOutputParser
+
+    load_dotenv()
+
+    arg_parser = argparse.ArgumentParser(description="Run the movie JSON chain over a JSONL file of {\"movie\": ...} records")
+    arg_parser.add_argument("--input", default="movies.jsonl")
+    arg_parser.add_argument("--output", default="movies_output.jsonl")
+    arg_parser.add_argument("--concurrency", type=int, default=8)
+    arg_parser.add_argument("--keep-errors", action="store_true", help="don't retry records that failed in a previous run")
+    arg_parser.add_argument("--check", action="store_true", help="check checkpoint/retry behaviour with a local chain and exit")
+    args = arg_parser.parse_args()
+    if args.check:
+        check_retry_keeps_one_row_per_index()
+        print("retried records keep one row per index: ok")
+        raise SystemExit
+
+    model = get_chat_model("meta-llama/Llama-4-Scout-17B-16E-Instruct")
+    parser = RepairingOutputParser.from_llm(model, JsonOutputParser()) # broken JSON is fixed locally before re-asking the model
+    template = PromptTemplate(
+        template="Give me the name of director, producer, actors of the given movie: \n{movie}\n{format_instruction}",
+        input_variables=["movie"],
+        partial_variables={"format_instruction":parser.get_format_instructions()}
+    )
+    chain = template | model | parser
+
+    report = run_jsonl(chain, args.input, args.output, args.concurrency, retry_errors=not args.keep_errors)
+    report["parser"] = parser.stats
+    print(json.dumps(report, indent=2))
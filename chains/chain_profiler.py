@@ -0,0 +1,262 @@
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import Runnable
+from langchain_core.runnables.graph import Graph
+import threading
+import json
+import time
+import os
+
+STRUCTURAL_TAGS = ("seq:step:", "map:key:", "branch:", "condition:")
+COMPOSITES = ("RunnableSequence", "RunnableParallel")
+
+def _size(obj):
+    try:
+        return len(json.dumps(obj, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return len(str(obj).encode("utf-8"))
+
+class ChainProfiler(BaseCallbackHandler):
+    """Callback handler that records every run of a chain invocation: wall time, queue wait,
+    thread, input/output bytes and prompt/completion tokens for model calls.
+
+        profiler = ChainProfiler()
+        chain.invoke(inputs, config={"callbacks": [profiler]})
+        profiler.print_ascii(chain)
+        profiler.export_chrome_trace("chain_trace.json")
+    """
+
+    def __init__(self):
+        self.runs = {}
+        self._lock = threading.Lock() # RunnableParallel branches report from worker threads
+
+    # ---------------------------------- callbacks ----------------------------------
+
+    def _start(self, run_id, parent_run_id, name, tags, payload):
+        step = next((tag for tag in tags or [] if tag.startswith(STRUCTURAL_TAGS)), None)
+        with self._lock:
+            self.runs[str(run_id)] = {
+                "run_id": str(run_id),
+                "parent_run_id": str(parent_run_id) if parent_run_id else None,
+                "name": name,
+                "step": step,
+                "thread": threading.get_ident(),
+                "start": time.perf_counter(),
+                "end": None,
+                "input_bytes": _size(payload),
+                "output_bytes": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "error": None
+            }
+
+    def _end(self, run_id, output_bytes=0, error=None):
+        with self._lock:
+            run = self.runs.get(str(run_id))
+            if run is not None:
+                run["end"] = time.perf_counter()
+                run["output_bytes"] = output_bytes
+                run["error"] = error
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, name=None, **kwargs):
+        self._start(run_id, parent_run_id, name or (serialized or {}).get("name", "chain"), tags, inputs)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id, _size(outputs))
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=repr(error))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, tags=None, name=None, **kwargs):
+        payload = [[message.content for message in batch] for batch in messages]
+        self._start(run_id, parent_run_id, name or (serialized or {}).get("name", "chat_model"), tags, payload)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, tags=None, name=None, **kwargs):
+        self._start(run_id, parent_run_id, name or (serialized or {}).get("name", "llm"), tags, prompts)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        with self._lock:
+            run = self.runs.get(str(run_id))
+            if run is not None:
+                run["streamed_tokens"] = run.get("streamed_tokens", 0) + 1
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        if str(run_id) not in self.runs:
+            return # started before the profiler was attached
+        generations = [g for batch in response.generations for g in batch]
+        self._end(run_id, sum(len(g.text.encode("utf-8")) for g in generations))
+        prompt_tokens = completion_tokens = 0
+        for g in generations:
+            usage = getattr(getattr(g, "message", None), "usage_metadata", None)
+            if usage:
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+        if not prompt_tokens and response.llm_output:
+            token_usage = response.llm_output.get("token_usage") or {}
+            prompt_tokens = token_usage.get("prompt_tokens", 0)
+            completion_tokens = token_usage.get("completion_tokens", 0)
+        with self._lock:
+            run = self.runs.get(str(run_id))
+            if run is None:
+                return
+            run["prompt_tokens"] = prompt_tokens
+            run["completion_tokens"] = completion_tokens or run.get("streamed_tokens", 0)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=repr(error))
+
+    # ---------------------------------- analysis ----------------------------------
+
+    def _children(self):
+        children = {}
+        for run in self.runs.values():
+            children.setdefault(run["parent_run_id"], []).append(run)
+        return children
+
+    @staticmethod
+    def _order(run, parent):
+        # position of a run inside its parent, the same order get_graph() lays the nodes out in
+        step = run["step"] or ""
+        if step.startswith("seq:step:"):
+            return int(step.rsplit(":", 1)[1])
+        if step.startswith("map:key:") and "<" in parent["name"]:
+            keys = parent["name"][parent["name"].index("<") + 1:-1].split(",")
+            key = step[len("map:key:"):]
+            return keys.index(key) if key in keys else len(keys)
+        return run["start"]
+
+    def queue_wait(self, run):
+        """Time between the moment a run could have started and the moment it did: the parent's start
+        for parallel branches, the end of the previous step for sequence steps."""
+        parent = self.runs.get(run["parent_run_id"])
+        if parent is None:
+            return 0.0
+        ready = parent["start"]
+        if (run["step"] or "").startswith("seq:step:"):
+            position = int(run["step"].rsplit(":", 1)[1])
+            for sibling in self._children().get(run["parent_run_id"], []):
+                if sibling["step"] == f"seq:step:{position - 1}" and sibling["end"]:
+                    ready = sibling["end"]
+        return max(run["start"] - ready, 0.0)
+
+    def leaf_runs(self):
+        """Runs that correspond to nodes of get_graph(): children of sequences and parallels, in graph order."""
+        children = self._children()
+
+        def walk(run):
+            if not run["name"].startswith(COMPOSITES):
+                return [run]
+            ordered = sorted(children.get(run["run_id"], []), key=lambda child: self._order(child, run))
+            return [leaf for child in ordered for leaf in walk(child)]
+
+        roots = sorted(children.get(None, []), key=lambda run: run["start"])
+        return [leaf for root in roots for leaf in walk(root)]
+
+    def annotated_graph(self, chain):
+        graph = chain.get_graph()
+        remaining = {}
+        for run in self.leaf_runs():
+            remaining.setdefault(run["name"], []).append(run)
+
+        nodes = {}
+        for node_id, node in graph.nodes.items():
+            if isinstance(node.data, Runnable) and remaining.get(node.data.get_name()):
+                run = remaining[node.data.get_name()].pop(0)
+                label = f"{node.name} {1000 * ((run['end'] or run['start']) - run['start']):.0f}ms"
+                if run["prompt_tokens"] or run["completion_tokens"]:
+                    label += f" {run['prompt_tokens']}->{run['completion_tokens']}tok"
+                node = node.copy(name=label)
+            nodes[node_id] = node
+        return Graph(nodes=nodes, edges=list(graph.edges))
+
+    def print_ascii(self, chain):
+        self.annotated_graph(chain).print_ascii()
+
+    def summary(self):
+        rows = []
+        for run in sorted(self.runs.values(), key=lambda run: run["start"]):
+            rows.append({
+                "name": run["name"],
+                "step": run["step"],
+                "wall_ms": round(1000 * ((run["end"] or time.perf_counter()) - run["start"]), 2),
+                "queue_wait_ms": round(1000 * self.queue_wait(run), 2),
+                "input_bytes": run["input_bytes"],
+                "output_bytes": run["output_bytes"],
+                "prompt_tokens": run["prompt_tokens"],
+                "completion_tokens": run["completion_tokens"],
+                "error": run["error"]
+            })
+        return rows
+
+    # ---------------------------------- export ----------------------------------
+
+    def export_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def export_chrome_trace(self, path):
+        """Writes the runs in Chrome trace event format, open it in chrome://tracing or ui.perfetto.dev."""
+        origin = min((run["start"] for run in self.runs.values()), default=0.0)
+        events = []
+        for run in self.runs.values():
+            end = run["end"] or run["start"]
+            events.append({
+                "name": run["name"],
+                "cat": run["step"] or "root",
+                "ph": "X",
+                "ts": 1e6 * (run["start"] - origin),
+                "dur": 1e6 * (end - run["start"]),
+                "pid": os.getpid(),
+                "tid": run["thread"],
+                "args": {
+                    "queue_wait_ms": round(1000 * self.queue_wait(run), 2),
+                    "input_bytes": run["input_bytes"],
+                    "output_bytes": run["output_bytes"],
+                    "prompt_tokens": run["prompt_tokens"],
+                    "completion_tokens": run["completion_tokens"]
+                }
+            })
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+if __name__ == "__main__":
+    from langchain_core.runnables import RunnableParallel
+    from langchain_core.prompts import PromptTemplate
+    from langchain_core.output_parsers import StrOutputParser
+    from dotenv import load_dotenv
+
+    from chatmodels.model_registry import get_chat_model
+
+    load_dotenv()
+
+    model = get_chat_model("meta-llama/Llama-4-Scout-17B-16E-Instruct")
+
+    template_pros = PromptTemplate(
+        template="Generate pros from the text:{text}",
+        input_variables=["text"]
+    )
+    template_cons = PromptTemplate(
+        template="Generate cons from the text:{text}",
+        input_variables=["text"]
+    )
+    template_merge = PromptTemplate(
+        template="Merge the pros and cons\npros->{pros}\ncons->{cons}",
+        input_variables=["pros","cons"]
+    )
+    parser = StrOutputParser()
+    parallel_chain = RunnableParallel(
+        {
+            "pros":template_pros|model|parser,
+            "cons":template_cons|model|parser
+        }
+    )
+    final_chain = parallel_chain|template_merge|model|parser
+
+    profiler = ChainProfiler()
+    result = final_chain.invoke({"text":"Artificial Intelligence"}, config={"callbacks":[profiler]})
+    print(result)
+
+    profiler.print_ascii(final_chain)
+    for row in profiler.summary():
+        print(row)
+    profiler.export_json("chain_profile.json")
+    profiler.export_chrome_trace("chain_trace.json")
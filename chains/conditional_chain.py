@@ -1,23 +1,21 @@
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
 from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser,PydanticOutputParser
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnableBranch, RunnableLambda
 from pydantic import BaseModel, Field
 from typing import Literal
 from dotenv import load_dotenv
 
+from chatmodels.model_registry import get_chat_model
+from output_parsers.compiled_pydantic_parser import get_pydantic_parser
+
 load_dotenv()
 
 class Sentiment(BaseModel):
     sentiment:Literal["positive","negative"]=Field(description="This is the sentiment of the feedback")
 
 
-llm = HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-4-Scout-17B-16E-Instruct",
-    task="text-generation"
-)
-model = ChatHuggingFace(llm=llm)
-pydantic_parser = PydanticOutputParser(pydantic_object=Sentiment)
+model = get_chat_model("meta-llama/Llama-4-Scout-17B-16E-Instruct")
+pydantic_parser = get_pydantic_parser(Sentiment)
 str_parser = StrOutputParser()
 template_classifier=PromptTemplate(
     template="Classify the sentiment of the feedback as positive or negative\nfeedback:{feedback}\n{format_instruction}",
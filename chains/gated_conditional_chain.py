@@ -0,0 +1,168 @@
+from langchain_core.prompts import PromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableBranch, RunnableLambda
+from pydantic import BaseModel, Field
+from typing import Literal
+from dotenv import load_dotenv
+import itertools
+import random
+import json
+import math
+import os
+import re
+import time
+import zlib
+
+from chatmodels.model_registry import get_chat_model
+from output_parsers.compiled_pydantic_parser import get_pydantic_parser
+
+load_dotenv()
+
+class Sentiment(BaseModel):
+    sentiment:Literal["positive","negative"]=Field(description="This is the sentiment of the feedback")
+
+class HashedNgramClassifier:
+    # logistic regression over hashed word uni/bi-grams, cheap enough to run before every LLM call
+
+    def __init__(self, n_features=2**18, learning_rate=0.5, epochs=10):
+        self.n_features = n_features
+        self.learning_rate = learning_rate
+        self.epochs = epochs
+        self.weights = {}
+        self.bias = 0.0
+        self.n_trained = 0
+
+    def _features(self, text):
+        words = re.findall(r"[a-z']+", text.lower())
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        # crc32 instead of hash() so the feature ids survive a restart (hash() is salted per process)
+        return {zlib.crc32(gram.encode("utf-8")) % self.n_features for gram in grams}
+
+    def predict_proba(self, text):
+        z = self.bias + sum(self.weights.get(f, 0.0) for f in self._features(text))
+        return 1 / (1 + math.exp(-max(min(z, 30), -30))) # probability of "positive"
+
+    def fit(self, texts, labels):
+        examples = [(self._features(text), 1.0 if label == "positive" else 0.0) for text, label in zip(texts, labels)]
+        rng = random.Random(0)
+        for _ in range(self.epochs):
+            rng.shuffle(examples)
+            for features, y in examples:
+                z = self.bias + sum(self.weights.get(f, 0.0) for f in features)
+                error = y - 1 / (1 + math.exp(-max(min(z, 30), -30)))
+                self.bias += self.learning_rate * error
+                for f in features:
+                    self.weights[f] = self.weights.get(f, 0.0) + self.learning_rate * error
+        self.n_trained = len(examples)
+        return self
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({"bias": self.bias, "n_trained": self.n_trained, "weights": self.weights}, f)
+
+    def load(self, path):
+        with open(path) as f:
+            state = json.load(f)
+        self.bias = state["bias"]
+        self.n_trained = state["n_trained"]
+        self.weights = {int(k): v for k, v in state["weights"].items()}
+        return self
+
+class GatedSentimentRouter:
+    """Answers with the local classifier when it is confident enough and falls back to the LLM
+    classifier chain otherwise. Every LLM label is appended to `label_log` so the local model
+    can be retrained from it with `retrain()`."""
+
+    def __init__(self, llm_classifier, threshold=0.9, min_examples=20, label_log="sentiment_labels.jsonl", model_path="sentiment_model.json"):
+        self.llm_classifier = llm_classifier
+        self.threshold = threshold
+        self.min_examples = min_examples
+        self.label_log = label_log
+        self.model_path = model_path
+        self.local = HashedNgramClassifier()
+        if os.path.exists(model_path):
+            self.local.load(model_path)
+        self.stats = {"local": 0, "llm": 0}
+
+    def classify(self, x):
+        feedback = x["feedback"]
+        if self.local.n_trained >= self.min_examples:
+            p = self.local.predict_proba(feedback)
+            if max(p, 1 - p) >= self.threshold:
+                self.stats["local"] += 1
+                return Sentiment(sentiment="positive" if p >= 0.5 else "negative")
+
+        self.stats["llm"] += 1
+        result = self.llm_classifier.invoke(x)
+        with open(self.label_log, "a") as f:
+            f.write(json.dumps({"feedback": feedback, "sentiment": result.sentiment}) + "\n")
+        return result
+
+    def retrain(self):
+        with open(self.label_log) as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        self.local = HashedNgramClassifier().fit([r["feedback"] for r in records], [r["sentiment"] for r in records])
+        self.local.save(self.model_path)
+
+model = get_chat_model("meta-llama/Llama-4-Scout-17B-16E-Instruct")
+pydantic_parser = get_pydantic_parser(Sentiment)
+str_parser = StrOutputParser()
+template_classifier=PromptTemplate(
+    template="Classify the sentiment of the feedback as positive or negative\nfeedback:{feedback}\n{format_instruction}",
+    input_variables=["feedback"],
+    partial_variables={"format_instruction":pydantic_parser.get_format_instructions()}
+)
+classifier_chain = template_classifier|model|pydantic_parser
+router = GatedSentimentRouter(classifier_chain, threshold=0.9)
+
+template_positive = PromptTemplate(
+    template="Write an appropriate message to this positive feedback\n{feedback}",
+    input_variables=["feedback"]
+)
+template_negative = PromptTemplate(
+    template="Write an appropriate message to this negative feedback\n{feedback}",
+    input_variables=["feedback"]
+)
+
+branch_chain = RunnableBranch(
+    (lambda x:x["sentiment"].sentiment=="positive",template_positive|model|str_parser),
+    (lambda x:x["sentiment"].sentiment=="negative",template_negative|model|str_parser),
+    RunnableLambda(lambda x:"Couldn't find the sentiment")
+)
+# unlike conditional_chain.py the feedback itself is kept next to the sentiment, the reply prompts need it
+final_chain = RunnableLambda(lambda x: {"feedback": x["feedback"], "sentiment": router.classify(x)})|branch_chain
+
+if __name__ == "__main__": # the demo and the benchmark call the LLM
+    print(final_chain.invoke({"feedback":"This is a wonderful phone"}))
+    final_chain.get_graph().print_ascii()
+
+    #---------------------------------- Synthetic feedback benchmark ----------------------------------
+
+    products = ["phone", "laptop", "headphones", "charger", "watch", "camera"]
+    positive = ["I love this {p}", "This {p} is wonderful", "Great {p}, works perfectly", "Amazing battery life on this {p}", "Very happy with the {p}, highly recommend"]
+    negative = ["I hate this {p}", "This {p} is terrible", "The {p} stopped working after a week", "Worst {p} I have ever bought", "Very disappointed with the {p}, want a refund"]
+    synthetic = [(t.format(p=p), "positive") for t, p in itertools.product(positive, products)]
+    synthetic += [(t.format(p=p), "negative") for t, p in itertools.product(negative, products)]
+    random.Random(1).shuffle(synthetic)
+
+    warmup, evaluation = synthetic[:router.min_examples], synthetic[router.min_examples:]
+    for feedback, _ in warmup: # labels for the local model come from the LLM, logged by the router
+        router.classify({"feedback": feedback})
+    router.retrain()
+
+    router.stats = {"local": 0, "llm": 0}
+    llm_latency, gated_latency, correct = [], [], 0
+    for feedback, label in evaluation:
+        start = time.perf_counter()
+        predicted = router.classify({"feedback": feedback}).sentiment
+        gated_latency.append(time.perf_counter() - start)
+        correct += predicted == label
+
+    for feedback, _ in evaluation[:5]: # a few ungated calls for the baseline latency
+        start = time.perf_counter()
+        classifier_chain.invoke({"feedback": feedback})
+        llm_latency.append(time.perf_counter() - start)
+
+    print(f"LLM calls avoided: {router.stats['local']}/{len(evaluation)} ({router.stats['local'] / len(evaluation):.0%})")
+    print(f"accuracy vs synthetic labels: {correct / len(evaluation):.0%}")
+    print(f"mean classification latency: LLM {sum(llm_latency) / len(llm_latency):.3f}s, gated {sum(gated_latency) / len(gated_latency):.3f}s")
@@ -1,16 +1,13 @@
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
 from dotenv import load_dotenv
 
-load_dotenv()
+from chatmodels.llm_cache import SQLiteLLMCache
+from chatmodels.model_registry import get_chat_model
 
-llm = HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-4-Scout-17B-16E-Instruct",
-    task="text-generation"
-)
+load_dotenv()
 
-model = ChatHuggingFace(llm=llm)
+model = get_chat_model("meta-llama/Llama-4-Scout-17B-16E-Instruct", cache=SQLiteLLMCache())
 parser = StrOutputParser()
 
 template1 = PromptTemplate(
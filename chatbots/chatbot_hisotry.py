@@ -1,27 +1,22 @@
-from langchain_huggingface import HuggingFaceEndpoint,ChatHuggingFace
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from dotenv import load_dotenv
 # from langchain_core.prompts import ChatPromptTemplate ---- Do this for Dynamic chat prompt templates
 
-load_dotenv()
+from chatmodels.model_registry import get_chat_model, prefetch
+from chatbots.rolling_memory import RollingSummaryMemory
 
-llm = HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-3.3-70B-Instruct",
-    task="text-generation"
-)
+load_dotenv()
 
-model = ChatHuggingFace(
-    llm=llm
-) 
-history = [
-    SystemMessage(content="You are an helpful assistant who's job is to provide crisp on point replies")
-]
+prefetch("meta-llama/Llama-3.3-70B-Instruct") # the model is built in the background while the first message is typed
+system_message = SystemMessage(content="You are an helpful assistant who's job is to provide crisp on point replies")
+# last turns verbatim within ~1500 tokens, older turns are summarized in the background between turns
+memory = RollingSummaryMemory(lambda: get_chat_model("meta-llama/Llama-3.3-70B-Instruct"), max_tokens=1500)
 while True:
     user_input = input("You: ")
     if user_input.lower() == "exit": break
-    history.append(HumanMessage(content=user_input))
-    result = model.invoke(history)
-    history.append(AIMessage(content=result.content))
+    question = HumanMessage(content=user_input)
+    result = get_chat_model("meta-llama/Llama-3.3-70B-Instruct").invoke([system_message, *memory.messages(), question])
+    memory.add_turn(question, AIMessage(content=result.content))
     print("AI: ", result.content)
     
-print(history) #here the history can be stored somewhere as txt or in data base which can be then included in chatbot_session.py file where we can have the track of the sessions
\ No newline at end of file
+print(memory.messages()) #here the history can be stored somewhere as txt or in data base which can be then included in chatbot_session.py file where we can have the track of the sessions
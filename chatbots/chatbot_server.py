@@ -0,0 +1,185 @@
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from chatbots.rolling_memory import RollingSummaryMemory
+from collections import OrderedDict
+import argparse
+import asyncio
+import logging
+import json
+import time
+
+logger = logging.getLogger(__name__)
+
+template = ChatPromptTemplate([
+    ("system","You are an helpful assistant who's job is to provide crisp on point replies"),
+    MessagesPlaceholder(variable_name="chat_history"),
+    ("human","{query}")]
+)
+
+class FakeStreamingChatModel(BaseChatModel):
+    """Local stand-in for the endpoint: answers with `reply` word by word, `token_delay` seconds per word."""
+    reply: str = "A denial of service attack floods a service with requests until it can not answer legitimate users."
+    first_token_delay: float = 0.2
+    token_delay: float = 0.01
+
+    @property
+    def _llm_type(self):
+        return "fake-streaming"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token_delay + self.token_delay * len(self.reply.split()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.first_token_delay)
+        for word in self.reply.split(" "):
+            await asyncio.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        text = ""
+        async for chunk in self._astream(messages):
+            text += chunk.message.content
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text.strip()))])
+
+class ChatServer:
+    """Many chat sessions in one asyncio process.
+
+    Protocol: newline delimited JSON over TCP. The client sends {"session": id, "query": text}, the server
+    answers with {"token": ...} lines while the model streams and ends with {"done": true}. Requests of one
+    connection are answered in order, every session keeps its own RollingSummaryMemory.
+
+    Back-pressure: at most `max_concurrency` model calls run at once, up to `max_pending` more wait for a slot
+    and anything beyond that is refused with {"error": "busy"} right away. Tokens are written with
+    `await drain()`, a slow reader pauses its own stream instead of filling the server's memory."""
+
+    def __init__(self, model, max_concurrency=64, max_pending=512, max_sessions=10_000, memory_tokens=1500, store=None):
+        self.model = model
+        self.chain = template | model
+        self.memory_tokens = memory_tokens
+        self.max_pending = max_pending
+        self.max_sessions = max_sessions
+        self.store = store # optional SQLiteSessionStore, sessions are then persisted and resumed
+        self.sessions = OrderedDict() # session id -> [memory, lock, requests in progress, loaded], least recently used first
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.waiting = 0
+        self.stats = {"connections": 0, "requests": 0, "busy": 0, "errors": 0, "store_errors": 0}
+
+    def _session(self, session_id):
+        """The session's [memory, lock, requests in progress, loaded from the store], pinned until `_unpin`."""
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = [RollingSummaryMemory(self.model, max_tokens=self.memory_tokens), asyncio.Lock(), 0, self.store is None]
+            if self.store is not None:
+                session[0].on_summary = lambda summary, folded: self._save_summary(session_id, summary, folded)
+        self.sessions.move_to_end(session_id)
+        session[2] += 1
+        return session
+
+    def _unpin(self, session):
+        session[2] -= 1
+        for session_id in list(self.sessions)[:max(len(self.sessions) - self.max_sessions, 0)]:
+            if self.sessions[session_id][2] == 0: # idle, resumed from the store if it comes back
+                del self.sessions[session_id]
+
+    def _save_summary(self, session_id, summary, folded):
+        # called on the event loop after a fold, the SQLite write runs on a worker thread
+        future = asyncio.get_running_loop().run_in_executor(None, self.store.save_summary, session_id, summary, self.store.seq_of(folded[-1][1]))
+        future.add_done_callback(lambda future: self._summary_saved(session_id, future))
+
+    def _summary_saved(self, session_id, future):
+        # nothing awaits the write, a failure is logged and counted here instead of being lost
+        if not future.cancelled() and future.exception() is not None:
+            self.stats["store_errors"] += 1
+            logger.error("summary of session %s not saved", session_id, exc_info=future.exception())
+
+    async def _send(self, writer, payload):
+        writer.write((json.dumps(payload) + "\n").encode("utf-8"))
+        await writer.drain()
+
+    async def answer(self, session_id, query, writer):
+        if self.waiting >= self.max_pending:
+            self.stats["busy"] += 1
+            await self._send(writer, {"error": "busy"})
+            return
+        session = self._session(session_id) # pinned: evicting it mid turn would lose the turn from memory
+        memory, lock = session[0], session[1]
+        self.waiting += 1
+        started = False
+        try:
+            async with lock: # one turn per session at a time
+                if not session[3]:
+                    memory.load(*await asyncio.to_thread(self.store.load_for_prompt, session_id, self.memory_tokens))
+                    session[3] = True
+                async with self.slots: # `max_concurrency` model calls overall
+                    self.waiting -= 1
+                    started = True
+                    text = ""
+                    async for chunk in self.chain.astream({"chat_history": memory.messages(), "query": query}):
+                        text += chunk.content
+                        await self._send(writer, {"token": chunk.content})
+                question, answer = HumanMessage(content=query), AIMessage(content=text)
+                if self.store is not None:
+                    question, answer = await asyncio.to_thread(self.store.append, session_id, question, answer)
+                await memory.aadd_turn(question, answer)
+        finally:
+            if not started:
+                self.waiting -= 1 # connection dropped while queued
+            self._unpin(session)
+        await self._send(writer, {"done": True})
+
+    async def handle(self, reader, writer):
+        self.stats["connections"] += 1
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    session_id, query = str(request["session"]), str(request["query"])
+                except (ValueError, KeyError, TypeError) as e:
+                    await self._send(writer, {"error": f"bad request: {e!r}"})
+                    continue
+                self.stats["requests"] += 1
+                try:
+                    await self.answer(session_id, query, writer)
+                except ConnectionError:
+                    break
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    await self._send(writer, {"error": f"{type(e).__name__}: {e}"})
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        return await asyncio.start_server(self.handle, host, port, limit=1 << 20)
+
+async def main(args):
+    if args.fake:
+        model = FakeStreamingChatModel()
+    else:
+        from dotenv import load_dotenv
+
+        from chatmodels.model_registry import get_chat_model
+
+        load_dotenv()
+        model = get_chat_model("meta-llama/Llama-3.3-70B-Instruct")
+    store = None
+    if args.store:
+        from chatbots.session_store import SQLiteSessionStore
+        store = SQLiteSessionStore()
+    chat_server = ChatServer(model, max_concurrency=args.max_concurrency, max_pending=args.max_pending, store=store)
+    server = await chat_server.serve(args.host, args.port)
+    print(f"chatbot server on {args.host}:{args.port} ({'fake model' if args.fake else 'Llama-3.3-70B-Instruct'})")
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="asyncio chatbot server, newline delimited JSON over TCP")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--fake", action="store_true", help="answer with the local fake streaming model")
+    arg_parser.add_argument("--store", action="store_true", help="persist sessions in chat_sessions.db")
+    arg_parser.add_argument("--max-concurrency", type=int, default=64, help="model calls running at once")
+    arg_parser.add_argument("--max-pending", type=int, default=512, help="requests waiting for a slot before new ones are refused")
+    asyncio.run(main(arg_parser.parse_args()))
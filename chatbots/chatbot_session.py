@@ -1,36 +1,55 @@
 #Using chatprompttemplate for Dynamic chat prompt templates
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_huggingface import HuggingFaceEndpoint,ChatHuggingFace
 from langchain_core.messages import HumanMessage, AIMessage
 from dotenv import load_dotenv
+import sys
+import os
+
+from chatmodels.model_registry import get_chat_model, get_embeddings, prefetch
+from chatbots.rolling_memory import RollingSummaryMemory
+from chatbots.long_term_memory import VectorMemory
+from chatbots.session_store import SQLiteSessionStore
 
 load_dotenv()
 
-llm = HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-3.3-70B-Instruct",
-    task="text-generation"
-)
-model = ChatHuggingFace(
-    llm=llm
-) 
+prefetch("meta-llama/Llama-3.3-70B-Instruct") # the model is built in the background while the first message is typed
 template=ChatPromptTemplate([
     ("system","You are an helpful assistant who's job is to provide crisp on point replies"),
     MessagesPlaceholder(variable_name="chat_history"),
     ("human","{query}")]
 )
 
-chat_history=[]
-with open("history.txt","r") as f:
-    chat_history.extend(f.readlines())
+args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+session_id = args[0] if args else "default" # python -m chatbots.chatbot_session <session id> [--long-term] resumes that session
+long_term = "--long-term" in sys.argv
+store = SQLiteSessionStore() # chat_sessions.db, one row per message
+if store.count(session_id) == 0 and os.path.exists("history.txt"):
+    store.import_history_txt("history.txt", session_id) # one time migration of the old history file
+
+if long_term:
+    # every turn of the session stays retrievable: the 4 most relevant earlier turns + the last 4 verbatim
+    memory = VectorMemory(lambda: get_embeddings("BAAI/bge-m3"), k=4, recent_turns=4, store=store, session_id=session_id)
+    memory.load(store.tail(session_id, limit=10 ** 9)) # saved vectors are reused, only new turns are embedded on the first question
+else:
+    # turns of this session: last ones verbatim within ~1500 tokens, older ones summarized in the background between turns
+    memory = RollingSummaryMemory(
+        lambda: get_chat_model("meta-llama/Llama-3.3-70B-Instruct"),
+        max_tokens=1500,
+        on_summary=lambda summary, folded: store.save_summary(session_id, summary, store.seq_of(folded[-1][1]))
+    )
+    memory.load(*store.load_for_prompt(session_id, max_tokens=1500)) # only the tail the prompt needs is read
 
 while True:
     user_input = input("You: ")
     if user_input.lower() == "exit": break
+    chat_history = memory.messages(user_input) if long_term else memory.messages()
     prompt = template.invoke({"chat_history":chat_history,"query": user_input})
     # print(prompt)
-    result = model.invoke(prompt)
+    result = get_chat_model("meta-llama/Llama-3.3-70B-Instruct").invoke(prompt)
     print("AI: ", result.content)
-    chat_history.append(HumanMessage(content=user_input))
-    chat_history.append(AIMessage(content=result.text))
+    question, answer = store.append(session_id, HumanMessage(content=user_input), AIMessage(content=result.text))
+    memory.add_turn(question, answer)
 
-print(chat_history)
\ No newline at end of file
+if not long_term:
+    memory.wait() # let a running summary land in the store before exiting
+    print(memory.messages())
\ No newline at end of file
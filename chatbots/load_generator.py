@@ -0,0 +1,72 @@
+from chatbots.chatbot_server import ChatServer, FakeStreamingChatModel
+import argparse
+import asyncio
+import json
+import time
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(int(p * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+async def run_session(host, port, session_id, turns, results):
+    """One simulated user: a connection of its own, `turns` questions one after another."""
+    reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+    try:
+        for turn in range(turns):
+            request = {"session": session_id, "query": f"question {turn} of {session_id}: what is a DoS attack?"}
+            start = time.perf_counter()
+            writer.write((json.dumps(request) + "\n").encode("utf-8"))
+            await writer.drain()
+            first_token, tokens = None, 0
+            while True:
+                reply = json.loads(await reader.readline())
+                if "token" in reply:
+                    tokens += 1
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    continue
+                if "error" in reply:
+                    results["errors"].append(reply["error"])
+                else:
+                    results["first_token"].append(first_token or 0.0)
+                    results["latency"].append(time.perf_counter() - start)
+                    results["tokens"] += tokens
+                break
+    finally:
+        writer.close()
+
+async def main(args):
+    server = None
+    if args.local:
+        # the server with the fake model in this process, on a free port
+        chat_server = ChatServer(FakeStreamingChatModel(), max_concurrency=args.max_concurrency, max_pending=args.max_pending)
+        server = await chat_server.serve(args.host, 0)
+        args.port = server.sockets[0].getsockname()[1]
+
+    results = {"first_token": [], "latency": [], "errors": [], "tokens": 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(args.host, args.port, f"load-{i}", args.turns, results) for i in range(args.sessions)))
+    elapsed = time.perf_counter() - start
+
+    done = len(results["latency"])
+    print(f"{args.sessions} sessions x {args.turns} turns in {elapsed:.2f}s: {done / elapsed:.1f} turns/s, "
+          f"{results['tokens'] / elapsed:.0f} tokens/s, {len(results['errors'])} refused/failed")
+    for name in ("first_token", "latency"):
+        values = results[name]
+        print(f"{name:<12} p50 {1000 * percentile(values, 0.5):7.1f}ms  p95 {1000 * percentile(values, 0.95):7.1f}ms  "
+              f"p99 {1000 * percentile(values, 0.99):7.1f}ms")
+    if server is not None:
+        print(chat_server.stats)
+        server.close()
+        await server.wait_closed()
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Load generator for chatbot_server.py")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--sessions", type=int, default=200, help="concurrent users, one connection each")
+    arg_parser.add_argument("--turns", type=int, default=5, help="questions per user")
+    arg_parser.add_argument("--local", action="store_true", help="start a server with the fake model in this process")
+    arg_parser.add_argument("--max-concurrency", type=int, default=64, help="--local only")
+    arg_parser.add_argument("--max-pending", type=int, default=512, help="--local only")
+    asyncio.run(main(arg_parser.parse_args()))
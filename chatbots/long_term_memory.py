@@ -0,0 +1,229 @@
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.embeddings import Embeddings
+from collections import OrderedDict
+import threading
+import hashlib
+import heapq
+import math
+
+try:
+    import numpy as np
+except ImportError: # pure python scoring, fine for a few thousand turns
+    np = None
+
+class CachedEmbeddings(Embeddings):
+    """LRU cache in front of an embeddings model, misses of one call are sent as a single batch. Pass one
+    instance to the VectorMemory of several sessions and identical turns ("thanks!", "ok") are embedded once."""
+
+    def __init__(self, embeddings, max_items=50_000):
+        self.embeddings = embeddings
+        self.max_items = max_items
+        self.cache = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "batches": 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _get(self, key):
+        with self._lock:
+            vector = self.cache.get(key)
+            if vector is not None:
+                self.cache.move_to_end(key)
+                self.stats["hits"] += 1
+            return vector
+
+    def _put(self, key, vector):
+        with self._lock:
+            self.cache[key] = vector
+            if len(self.cache) > self.max_items:
+                self.cache.popitem(last=False)
+
+    def embed_documents(self, texts):
+        keys = [self._key(text) for text in texts]
+        vectors = [self._get(key) for key in keys]
+        missing = [idx for idx, vector in enumerate(vectors) if vector is None]
+        if missing:
+            self.stats["misses"] += len(missing)
+            self.stats["batches"] += 1
+            for idx, vector in zip(missing, self.embeddings.embed_documents([texts[idx] for idx in missing])):
+                vectors[idx] = vector
+                self._put(keys[idx], vector)
+        return vectors
+
+    def embed_query(self, text):
+        key = "query:" + self._key(text) # some models embed queries differently from documents
+        vector = self._get(key)
+        if vector is None:
+            self.stats["misses"] += 1
+            vector = self.embeddings.embed_query(text)
+            self._put(key, vector)
+        return vector
+
+def _normalize(vector):
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+class VectorMemory:
+    """Long-term memory of one chat session: every past turn is embedded into a per-session index and each new
+    query gets the `k` most relevant earlier turns plus the last `recent_turns` verbatim, so the prompt stays
+    the same size whether the session has ten turns or ten thousand.
+
+    Turns are embedded lazily and in batches of `batch_size`, only once they leave the recent window (until then
+    they are in the prompt anyway). `embeddings` is an Embeddings model or a function returning one. With a
+    SQLiteSessionStore as `store` the vectors of stored turns are saved next to their messages, and `load`
+    reads them back, so resuming a session only embeds the turns it never indexed before."""
+
+    def __init__(self, embeddings, k=4, recent_turns=4, batch_size=32, store=None, session_id=None):
+        self.embeddings = embeddings
+        self.store = store
+        self.session_id = session_id
+        self.k = k
+        self.recent_turns = recent_turns
+        self.batch_size = batch_size
+        self.turns = [] # [(HumanMessage, AIMessage)], oldest first
+        self.vectors = [] # normalized vectors of turns[:len(vectors)]
+        self._matrix = None # numpy copy of `vectors`, grows with every indexed batch
+        self._cached = None
+
+    @property
+    def cached_embeddings(self):
+        if self._cached is None:
+            embeddings = self.embeddings if isinstance(self.embeddings, Embeddings) else self.embeddings()
+            self._cached = embeddings if isinstance(embeddings, CachedEmbeddings) else CachedEmbeddings(embeddings)
+        return self._cached
+
+    @staticmethod
+    def _text(human, ai):
+        return f"User: {human.content}\nAssistant: {ai.content}"
+
+    def _seq(self, message):
+        # seq of a message from the store, None for turns that were never stored
+        return self.store.seq_of(message) if self.store is not None and message.id else None
+
+    def load(self, messages):
+        """Restores a session from stored messages. Turns with a saved vector are indexed right away, the
+        others on the first query."""
+        human = None
+        for message in messages:
+            if isinstance(message, HumanMessage):
+                human = message
+            elif isinstance(message, AIMessage) and human is not None:
+                self.turns.append((human, message))
+                human = None
+        if self.store is None:
+            return
+        saved = self.store.vectors(self.session_id)
+        vectors = []
+        for _, ai in self.turns[len(self.vectors):]:
+            vector = saved.get(self._seq(ai))
+            if vector is None:
+                break # the index covers a prefix of the turns, the rest is embedded on the next query
+            vectors.append(vector)
+        self._extend(vectors)
+
+    def _extend(self, vectors):
+        self.vectors.extend(vectors)
+        if np is not None and vectors:
+            block = np.asarray(vectors, dtype=np.float32)
+            self._matrix = block if self._matrix is None else np.vstack([self._matrix, block])
+
+    def add_turn(self, human, ai):
+        human = human if isinstance(human, HumanMessage) else HumanMessage(content=human)
+        ai = ai if isinstance(ai, AIMessage) else AIMessage(content=ai)
+        self.turns.append((human, ai))
+
+    def _index(self):
+        # embeds the turns that left the recent window, batch_size at a time
+        older = len(self.turns) - self.recent_turns
+        while len(self.vectors) < older:
+            batch = self.turns[len(self.vectors):min(older, len(self.vectors) + self.batch_size)]
+            vectors = [_normalize(vector) for vector in self.cached_embeddings.embed_documents([self._text(human, ai) for human, ai in batch])]
+            self._extend(vectors)
+            if self.store is not None:
+                seqs = [self._seq(ai) for _, ai in batch]
+                self.store.save_vectors(self.session_id, [(seq, vector) for seq, vector in zip(seqs, vectors) if seq is not None])
+
+    def _top_k(self, query_vector, candidates):
+        if candidates <= self.k:
+            return list(range(candidates))
+        if np is not None:
+            scores = self._matrix[:candidates] @ np.asarray(query_vector, dtype=np.float32)
+            return np.argpartition(-scores, self.k)[:self.k].tolist()
+        scores = ((sum(a * b for a, b in zip(vector, query_vector)), idx) for idx, vector in enumerate(self.vectors[:candidates]))
+        return [idx for _, idx in heapq.nlargest(self.k, scores)]
+
+    def relevant_turns(self, query):
+        older = len(self.turns) - self.recent_turns
+        if older <= 0 or self.k == 0:
+            return []
+        self._index()
+        query_vector = _normalize(self.cached_embeddings.embed_query(query))
+        return [self.turns[idx] for idx in sorted(self._top_k(query_vector, older))] # chronological order
+
+    def messages(self, query):
+        """Messages for the MessagesPlaceholder when answering `query`: relevant earlier turns, then the recent ones."""
+        history = []
+        relevant = self.relevant_turns(query)
+        if relevant:
+            history.append(SystemMessage(content="Relevant turns from earlier in this conversation:"))
+            for human, ai in relevant:
+                history.extend([human, ai])
+            history.append(SystemMessage(content="Most recent turns:"))
+        for human, ai in self.turns[max(0, len(self.turns) - self.recent_turns):]:
+            history.extend([human, ai])
+        return history
+
+if __name__ == "__main__":
+    from chatbots.rolling_memory import approx_tokens
+    from chatbots.session_store import SQLiteSessionStore
+    import tempfile
+    import random
+    import time
+    import zlib
+    import os
+
+    class HashingEmbeddings(Embeddings):
+        # local stand-in for the embedding endpoint: hashed bag of words, counts its calls
+        calls = 0
+
+        def embed_documents(self, texts):
+            HashingEmbeddings.calls += 1
+            return [self.embed_query(text) for text in texts]
+
+        def embed_query(self, text):
+            vector = [0.0] * 256
+            for word in text.lower().replace("?", " ").replace(".", " ").split():
+                vector[zlib.crc32(word.encode("utf-8")) % 256] += 1.0
+            return vector
+
+    rng = random.Random(3)
+    topics = ["kubernetes pods", "python generators", "sql joins", "tcp handshakes", "rust lifetimes", "css grid", "git rebase"]
+    memory = VectorMemory(HashingEmbeddings(), k=4, recent_turns=4)
+    memory.add_turn("My dog is called Biscuit and she is a beagle.", "Nice, Biscuit sounds like a great beagle!")
+    full_history_tokens = 0
+    for turn in range(1, 3001):
+        topic = rng.choice(topics)
+        memory.add_turn(f"Turn {turn}: tell me something about {topic}.", f"Here is a fact about {topic} number {turn}. " * 4)
+        if turn in (10, 100, 1000, 3000):
+            start = time.perf_counter()
+            history = memory.messages("What is the name of my dog?")
+            elapsed = time.perf_counter() - start
+            full = sum(approx_tokens([human, ai]) for human, ai in memory.turns)
+            found = any("Biscuit" in message.content for message in history)
+            print(f"{turn:>5} turns: full history {full:>7} tokens, long-term memory {approx_tokens(history):>4} tokens, "
+                  f"dog name retrieved: {found}, {1000 * elapsed:.1f}ms")
+    print(f"embedding calls: {HashingEmbeddings.calls} batches for {len(memory.vectors)} turns, {memory.cached_embeddings.stats}")
+
+    store = SQLiteSessionStore(os.path.join(tempfile.mkdtemp(), "bench_sessions.db"))
+    for human, ai in memory.turns:
+        store.append("dog-owner", human, ai)
+    for label in ("first start", "restart"):
+        HashingEmbeddings.calls = 0
+        resumed = VectorMemory(HashingEmbeddings(), k=4, recent_turns=4, store=store, session_id="dog-owner")
+        start = time.perf_counter()
+        resumed.load(store.tail("dog-owner", limit=10 ** 9))
+        found = any("Biscuit" in message.content for message in resumed.messages("What is the name of my dog?"))
+        print(f"{label} with the session store: {HashingEmbeddings.calls} embedding batches, dog name retrieved: {found}, "
+              f"{1000 * (time.perf_counter() - start):.0f}ms")
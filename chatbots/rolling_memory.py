@@ -0,0 +1,176 @@
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, get_buffer_string
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+import time
+
+SUMMARY_PROMPT = ChatPromptTemplate([
+    ("system", "You maintain the running summary of a conversation. Keep every fact, name, number and decision "
+               "the user may refer back to and drop small talk. Reply with the updated summary only."),
+    ("human", "Current summary:\n{summary}\n\nNew lines of conversation:\n{lines}\n\nUpdated summary:")
+])
+
+def approx_tokens(messages):
+    # ~4 characters per token plus a few tokens of role markup, close enough for budgeting
+    return sum(len(message.content) // 4 + 4 for message in messages)
+
+class RollingSummaryMemory:
+    """Chat history for a MessagesPlaceholder: the newest turns verbatim within `max_tokens`, everything older
+    folded into one running summary message.
+
+    Folding runs on a background thread after `add_turn` (or as an asyncio task after `aadd_turn`), so the
+    user's reply never waits for the summarizer. Until a fold lands the prompt simply carries a few more
+    verbatim turns. `summarizer` is a chat model or a function returning one, called on the first fold."""
+
+    def __init__(self, summarizer, max_tokens=1500, min_turns=2, token_counter=approx_tokens, on_summary=None):
+        self.summarizer = summarizer
+        self.max_tokens = max_tokens
+        self.min_turns = min_turns # never folded, the model always sees the last exchanges word for word
+        self.token_counter = token_counter
+        self.on_summary = on_summary # called with (summary, folded_turns) after every fold, e.g. to persist it
+        self.summary = ""
+        self.turns = [] # [(HumanMessage, AIMessage)], oldest first
+        self.stats = {"turns": 0, "folds": 0, "folded_turns": 0, "fold_errors": 0, "fold_seconds": 0.0}
+        self._chain = None
+        self._pending = None # future (threads) or task (asyncio) of the fold in progress
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summarize")
+
+    @property
+    def chain(self):
+        if self._chain is None:
+            model = self.summarizer if isinstance(self.summarizer, Runnable) else self.summarizer()
+            self._chain = SUMMARY_PROMPT | model | StrOutputParser()
+        return self._chain
+
+    def messages(self):
+        with self._lock:
+            summary, turns = self.summary, list(self.turns)
+        history = [SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")] if summary else []
+        for human, ai in turns:
+            history.extend([human, ai])
+        return history
+
+    def prompt_tokens(self):
+        return self.token_counter(self.messages())
+
+    def load(self, summary, messages):
+        """Restores a resumed session: its stored summary and the messages after it, paired into turns."""
+        turns, human = [], None
+        for message in messages:
+            if isinstance(message, HumanMessage):
+                human = message
+            elif isinstance(message, AIMessage) and human is not None:
+                turns.append((human, message))
+                human = None
+        with self._lock:
+            self.summary = summary
+            self.turns = turns
+
+    def _add(self, human, ai):
+        human = human if isinstance(human, HumanMessage) else HumanMessage(content=human)
+        ai = ai if isinstance(ai, AIMessage) else AIMessage(content=ai)
+        with self._lock:
+            self.turns.append((human, ai))
+            self.stats["turns"] += 1
+
+    def _select_fold(self):
+        """Oldest turns to fold once the verbatim turns outgrow `max_tokens`. Folding goes down to half the budget,
+        so the summarizer runs once every few turns instead of on every turn. None while a fold is still running."""
+        with self._lock:
+            if self._pending is not None and not self._pending.done():
+                return None
+            budget = self.max_tokens - self.token_counter([SystemMessage(content=self.summary)])
+            costs = [self.token_counter([human, ai]) for human, ai in self.turns]
+            if sum(costs) <= budget:
+                return None
+            keep, kept_tokens = 0, 0
+            for cost in reversed(costs):
+                if keep >= self.min_turns and kept_tokens + cost > budget // 2:
+                    break
+                kept_tokens += cost
+                keep += 1
+            fold = self.turns[:len(self.turns) - keep]
+            return (self.summary, fold) if fold else None
+
+    def _apply(self, fold, summary, started):
+        with self._lock:
+            self.summary = summary.strip()
+            del self.turns[:len(fold)] # only one fold runs at a time, these are still the oldest turns
+            self.stats["folds"] += 1
+            self.stats["folded_turns"] += len(fold)
+            self.stats["fold_seconds"] += time.perf_counter() - started
+        if self.on_summary is not None:
+            self.on_summary(self.summary, fold)
+
+    @staticmethod
+    def _inputs(summary, fold):
+        return {"summary": summary or "(empty)", "lines": get_buffer_string([m for turn in fold for m in turn])}
+
+    def _fold(self, summary, fold):
+        started = time.perf_counter()
+        try:
+            new_summary = self.chain.invoke(self._inputs(summary, fold))
+        except Exception:
+            self.stats["fold_errors"] += 1 # the turns stay verbatim, the next turn tries again
+            return
+        self._apply(fold, new_summary, started)
+
+    async def _afold(self, summary, fold):
+        started = time.perf_counter()
+        try:
+            new_summary = await self.chain.ainvoke(self._inputs(summary, fold))
+        except Exception:
+            self.stats["fold_errors"] += 1
+            return
+        self._apply(fold, new_summary, started)
+
+    def add_turn(self, human, ai):
+        self._add(human, ai)
+        selected = self._select_fold()
+        if selected is not None:
+            self._pending = self._executor.submit(self._fold, *selected)
+
+    async def aadd_turn(self, human, ai):
+        self._add(human, ai)
+        selected = self._select_fold()
+        if selected is not None:
+            self._pending = asyncio.create_task(self._afold(*selected))
+
+    def wait(self):
+        # blocks until the fold in progress finished, only needed before exit or in benchmarks
+        pending = self._pending
+        if pending is not None and not asyncio.isfuture(pending):
+            pending.result()
+
+    async def await_pending(self):
+        if self._pending is not None and asyncio.isfuture(self._pending):
+            await self._pending
+
+if __name__ == "__main__":
+    from langchain_core.language_models import FakeListChatModel
+
+    class SlowFakeSummarizer(FakeListChatModel):
+        # local stand-in for the endpoint, a summary takes 300ms
+        def _call(self, *args, **kwargs):
+            time.sleep(0.3)
+            return super()._call(*args, **kwargs)
+
+    memory = RollingSummaryMemory(SlowFakeSummarizer(responses=["The user asked about denial of service attacks, botnets and mitigations."]), max_tokens=800)
+    full_history = []
+    answer = "A denial of service attack floods a service with requests until it can't answer legitimate users. " * 5
+    for turn in range(1, 41):
+        question = f"Question {turn}: what about attack number {turn}?"
+        start = time.perf_counter()
+        memory.add_turn(question, answer)
+        overhead = time.perf_counter() - start
+        full_history.extend([HumanMessage(content=question), AIMessage(content=answer)])
+        if turn % 10 == 0:
+            print(f"turn {turn}: full history {approx_tokens(full_history)} tokens, rolling memory {memory.prompt_tokens()} tokens, "
+                  f"add_turn {1000 * overhead:.2f}ms")
+        time.sleep(0.1) # the user reading the answer and typing the next question
+    memory.wait()
+    print(memory.stats)
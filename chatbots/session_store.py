@@ -0,0 +1,200 @@
+from langchain_core.messages import message_to_dict, messages_from_dict
+from chatbots.rolling_memory import approx_tokens
+from array import array
+import threading
+import sqlite3
+import json
+import time
+import ast
+import os
+import re
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chat_sessions.db")
+
+class SQLiteSessionStore:
+    """Append-only store of typed chat messages per session id.
+
+    Every message is one row keyed by (session_id, seq), so appending never rewrites earlier messages and
+    resuming a session reads only the tail the prompt needs. The running summary of a session is stored
+    next to the seq it covers, `compact` then drops the verbatim messages the summary already stands for.
+    Messages coming out of the store, including the copies `append` returns, carry `id="<session_id>:<seq>"`.
+    Seqs are allocated inside the write transaction, so several processes can append to one database."""
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock() # sessions share the connection, summaries are saved from background threads
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL") # WAL + NORMAL: a crash can lose the last commit, never corrupt
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "session_id TEXT, seq INTEGER, type TEXT, message TEXT, created_at REAL, PRIMARY KEY (session_id, seq)) WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries (session_id TEXT PRIMARY KEY, summary TEXT, upto_seq INTEGER, updated_at REAL)"
+        )
+        self._conn.execute( # embeddings of VectorMemory turns, keyed by the seq of the turn's answer
+            "CREATE TABLE IF NOT EXISTS vectors (session_id TEXT, seq INTEGER, vector BLOB, PRIMARY KEY (session_id, seq)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def seq_of(message):
+        return int(message.id.rsplit(":", 1)[1])
+
+    def _load(self, session_id, rows):
+        messages = []
+        for seq, payload in rows:
+            message = messages_from_dict([json.loads(payload)])[0]
+            message.id = f"{session_id}:{seq}"
+            messages.append(message)
+        return messages
+
+    def append(self, session_id, *messages):
+        """Stores the messages after the session's last one and returns copies of them carrying their ids."""
+        now = time.time()
+        stored = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE") # takes the write lock first, no other writer can pick the same seqs
+            try:
+                seq = self._conn.execute( # compact may have deleted every message up to the summary, seqs still go on after it
+                    "SELECT MAX(COALESCE((SELECT MAX(seq) FROM messages WHERE session_id = ?), 0), "
+                    "COALESCE((SELECT upto_seq FROM summaries WHERE session_id = ?), 0))", (session_id, session_id)
+                ).fetchone()[0]
+                rows = []
+                for message in messages:
+                    seq += 1
+                    stored.append(message.model_copy(update={"id": f"{session_id}:{seq}"}))
+                    rows.append((session_id, seq, message.type, json.dumps(message_to_dict(message)), now))
+                self._conn.executemany("INSERT INTO messages VALUES (?, ?, ?, ?, ?)", rows)
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return stored
+
+    def tail(self, session_id, limit=50, before=None):
+        """The `limit` messages before seq `before` (default: the newest ones), oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, message FROM messages WHERE session_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+                (session_id, before if before is not None else 2 ** 62, limit)
+            ).fetchall()
+        return self._load(session_id, reversed(rows))
+
+    def summary(self, session_id):
+        with self._lock:
+            row = self._conn.execute("SELECT summary, upto_seq FROM summaries WHERE session_id = ?", (session_id,)).fetchone()
+        return row if row else ("", 0)
+
+    def save_summary(self, session_id, summary, upto_seq):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?)", (session_id, summary, upto_seq, time.time())
+            )
+            self._conn.commit()
+
+    def save_vectors(self, session_id, vectors):
+        """Stores (seq, vector) pairs as float32, a resumed session reads them back instead of embedding again."""
+        rows = [(session_id, seq, array("f", vector).tobytes()) for seq, vector in vectors]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO vectors VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def vectors(self, session_id):
+        """{seq: vector} of the session."""
+        with self._lock:
+            rows = self._conn.execute("SELECT seq, vector FROM vectors WHERE session_id = ?", (session_id,)).fetchall()
+        result = {}
+        for seq, blob in rows:
+            vector = array("f")
+            vector.frombytes(blob)
+            result[seq] = vector.tolist()
+        return result
+
+    def load_for_prompt(self, session_id, max_tokens=1500, token_counter=approx_tokens, page_size=20):
+        """(summary, messages) to resume a session: the stored summary plus the newest messages after it that
+        fit in `max_tokens`, read page by page from the end of the session."""
+        summary, upto_seq = self.summary(session_id)
+        messages, used, before = [], 0, None
+        while True:
+            page = self.tail(session_id, page_size, before)
+            for message in reversed(page):
+                cost = token_counter([message])
+                if self.seq_of(message) <= upto_seq or used + cost > max_tokens:
+                    return summary, messages
+                messages.insert(0, message)
+                used += cost
+            if len(page) < page_size:
+                return summary, messages
+            before = self.seq_of(page[0])
+
+    def count(self, session_id):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)).fetchone()[0]
+
+    def sessions(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session_id, COUNT(*), MAX(created_at) FROM messages GROUP BY session_id ORDER BY MAX(created_at) DESC"
+            ).fetchall()
+        return [{"session_id": session_id, "messages": count, "last_active": last} for session_id, count, last in rows]
+
+    def compact(self, session_id=None, vacuum=False):
+        """Deletes the messages already covered by their session's summary. `vacuum=True` also gives the freed
+        pages back to the file system, which rewrites the whole database file."""
+        with self._lock:
+            for table in ("vectors", "messages"):
+                query = f"DELETE FROM {table} WHERE seq <= (SELECT upto_seq FROM summaries WHERE summaries.session_id = {table}.session_id)"
+                if session_id is None:
+                    deleted = self._conn.execute(query).rowcount
+                else:
+                    deleted = self._conn.execute(query + " AND session_id = ?", (session_id,)).rowcount
+            self._conn.commit()
+            if vacuum:
+                self._conn.execute("VACUUM")
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)") # in WAL mode the file only shrinks once checkpointed
+        return deleted
+
+    def import_history_txt(self, path, session_id):
+        """One time migration of the old history.txt, a file of HumanMessage(...)/AIMessage(...) reprs."""
+        from langchain_core.messages import HumanMessage, AIMessage
+
+        kinds = {"HumanMessage": HumanMessage, "AIMessage": AIMessage}
+        messages = []
+        with open(path) as f:
+            for line in f:
+                for kind, content in re.findall(r"(HumanMessage|AIMessage)\(content=('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")\)", line):
+                    messages.append(kinds[kind](content=ast.literal_eval(content)))
+        if messages:
+            self.append(session_id, *messages)
+        return len(messages)
+
+if __name__ == "__main__":
+    from langchain_core.messages import HumanMessage, AIMessage
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_sessions.db")
+    store = SQLiteSessionStore(path)
+    answer = "A denial of service attack floods a service with requests until it can't answer legitimate users. " * 3
+
+    start = time.perf_counter()
+    for turn in range(500):
+        for session in range(100):
+            store.append(f"user-{session}", HumanMessage(content=f"question {turn}"), AIMessage(content=answer))
+    appends = 500 * 100
+    print(f"{appends} turn appends (100 sessions x 1000 messages): {1e6 * (time.perf_counter() - start) / appends:.0f}us per turn")
+
+    start = time.perf_counter()
+    summary, recent = store.load_for_prompt("user-42", max_tokens=1500)
+    print(f"resume user-42 (1000 messages): {len(recent)} messages for the prompt in {1000 * (time.perf_counter() - start):.2f}ms")
+    start = time.perf_counter()
+    everything = store.tail("user-42", limit=10 ** 9)
+    print(f"loading the whole session instead: {len(everything)} messages in {1000 * (time.perf_counter() - start):.2f}ms")
+
+    for session in range(100):
+        store.save_summary(f"user-{session}", "The user asked about denial of service attacks.", upto_seq=900)
+    size = os.path.getsize(path)
+    deleted = store.compact(vacuum=True)
+    print(f"compaction: {deleted} summarized messages removed, {size / 1e6:.1f}MB -> {os.path.getsize(path) / 1e6:.1f}MB")
+    print(store.sessions()[:2])
@@ -1,14 +1,12 @@
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
 from dotenv import load_dotenv
+from chatmodels.model_registry import get_chat_model, prefetch
 
 load_dotenv()
 
-llm=HuggingFaceEndpoint(
-    repo_id="openai/gpt-oss-20b",
-    task="text-generation"
-)
-model = ChatHuggingFace(llm=llm)
+prefetch("openai/gpt-oss-20b") # langchain_huggingface is imported while the question is typed
+question = input()
+model = get_chat_model("openai/gpt-oss-20b")
 
-result = model.invoke(input())
+result = model.invoke(question)
 
-print(result.content)
\ No newline at end of file
+print(result.content)
@@ -1,12 +1,10 @@
-from langchain_huggingface import HuggingFaceEmbeddings, HuggingFaceEndpointEmbeddings
 from dotenv import load_dotenv
+from chatmodels.model_registry import get_embeddings
 
 load_dotenv()
 
-embedding = HuggingFaceEndpointEmbeddings(
-    repo_id="sentence-transformers/all-MiniLM-L6-v2"
-)
+embedding = get_embeddings("sentence-transformers/all-MiniLM-L6-v2") # langchain_huggingface is imported here, not at startup
 
 vector =  embedding.embed_query("Hello World")
 print(len(vector))
-print(str(vector))
\ No newline at end of file
+print(str(vector))
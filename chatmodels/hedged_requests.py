@@ -0,0 +1,237 @@
+from langchain_core.runnables import Runnable
+from langchain_core.embeddings import Embeddings
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import deque
+import asyncio
+import threading
+import time
+
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+class Hedger:
+    """Sends a duplicate request when the first one is slower than `margin` times the `percentile` of recent
+    latencies and returns whichever answers first. Extra requests are capped at `budget` of all
+    requests. The margin keeps calls at the slow edge of the normal latencies, which are about to answer
+    anyway, from spending the budget before the stuck ones arrive. Sync losers can't be interrupted mid
+    HTTP call, their result is just dropped; async losers are cancelled."""
+
+    def __init__(self, percentile=0.95, budget=0.05, initial_delay=2.0, window=500, min_samples=20, margin=1.5):
+        self.percentile = percentile
+        self.budget = budget
+        self.margin = margin
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=window)
+        self.stats = {"requests": 0, "hedges": 0, "hedge_wins": 0}
+        self._lock = threading.Lock()
+
+    def hedge_delay(self):
+        with self._lock:
+            if len(self.latencies) < self.min_samples:
+                return self.initial_delay
+            ordered = sorted(self.latencies)
+        return self.margin * ordered[min(int(self.percentile * len(ordered)), len(ordered) - 1)]
+
+    def _record(self, started):
+        latency = time.perf_counter() - started
+        with self._lock:
+            self.latencies.append(latency)
+
+    def _take_budget(self):
+        with self._lock:
+            if self.stats["hedges"] + 1 > self.budget * self.stats["requests"] + 1:
+                return False
+            self.stats["hedges"] += 1
+            return True
+
+    def _won(self, future, primary):
+        if future is not primary:
+            with self._lock:
+                self.stats["hedge_wins"] += 1
+        return future.result()
+
+    def call(self, fn, *args, **kwargs):
+        return self.race(lambda: fn(*args, **kwargs))
+
+    def race(self, primary_call, hedge_call=None):
+        """Runs `primary_call()` and, once it is slower than the hedge delay, `hedge_call()` (the same call by
+        default) next to it."""
+        with self._lock:
+            self.stats["requests"] += 1
+
+        def submit(call):
+            started = time.perf_counter()
+            future = _executor.submit(call)
+            future.add_done_callback(lambda f: not f.cancelled() and f.exception() is None and self._record(started))
+            return future
+
+        primary = submit(primary_call)
+        pending = {primary}
+        try:
+            done, _ = wait(pending, timeout=self.hedge_delay())
+            if not done and self._take_budget():
+                pending.add(submit(hedge_call or primary_call))
+
+            error = None
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        return self._won(future, primary)
+                    error = future.exception()
+            raise error
+        finally:
+            for loser in pending: # only drops calls that haven't started, running ones finish in the background
+                loser.cancel()
+
+    async def acall(self, fn, *args, **kwargs):
+        return await self.arace(lambda: fn(*args, **kwargs))
+
+    async def arace(self, primary_call, hedge_call=None):
+        with self._lock:
+            self.stats["requests"] += 1
+
+        async def timed(call):
+            started = time.perf_counter()
+            result = await call()
+            self._record(started)
+            return result
+
+        primary = asyncio.ensure_future(timed(primary_call))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_delay())
+            if not done and self._take_budget():
+                pending.add(asyncio.ensure_future(timed(hedge_call or primary_call)))
+
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return self._won(task, primary)
+                    error = task.exception()
+            raise error
+        finally:
+            for loser in pending: # the losing request, or both when the caller itself is cancelled
+                loser.cancel()
+
+class HedgedChatModel(Runnable):
+    # opt-in wrapper: template | HedgedChatModel(model) | parser. invoke and ainvoke are hedged, stream and
+    # astream go to the model unhedged (a stream can't switch to the duplicate once chunks were sent)
+
+    def __init__(self, model, hedger=None):
+        self.model = model
+        self.hedger = hedger or Hedger()
+        self.name = f"Hedged[{model.get_name()}]"
+
+    def get_input_schema(self, config=None):
+        return self.model.get_input_schema(config)
+
+    def get_output_schema(self, config=None):
+        return self.model.get_output_schema(config)
+
+    @staticmethod
+    def _untraced(config):
+        # the duplicate runs without callbacks, so a request is logged (and profiled) once
+        return {**(config or {}), "callbacks": None}
+
+    def invoke(self, input, config=None, **kwargs):
+        return self.hedger.race(lambda: self.model.invoke(input, config, **kwargs),
+                                lambda: self.model.invoke(input, self._untraced(config), **kwargs))
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return await self.hedger.arace(lambda: self.model.ainvoke(input, config, **kwargs),
+                                       lambda: self.model.ainvoke(input, self._untraced(config), **kwargs))
+
+    def stream(self, input, config=None, **kwargs):
+        yield from self.model.stream(input, config, **kwargs)
+
+    async def astream(self, input, config=None, **kwargs):
+        async for chunk in self.model.astream(input, config, **kwargs):
+            yield chunk
+
+class HedgedEmbeddings(Embeddings):
+    # drop-in for HuggingFaceEndpointEmbeddings in vector stores and retrievers
+
+    def __init__(self, embeddings, hedger=None):
+        self.embeddings = embeddings
+        self.hedger = hedger or Hedger()
+
+    def embed_documents(self, texts):
+        return self.hedger.call(self.embeddings.embed_documents, texts)
+
+    def embed_query(self, text):
+        return self.hedger.call(self.embeddings.embed_query, text)
+
+    async def aembed_documents(self, texts):
+        return await self.hedger.acall(self.embeddings.aembed_documents, texts)
+
+    async def aembed_query(self, text):
+        return await self.hedger.acall(self.embeddings.aembed_query, text)
+
+if __name__ == "__main__":
+    from langchain_core.language_models import FakeListChatModel
+    import random
+
+    rng = random.Random(7)
+
+    def endpoint_latency():
+        # local stand-in for the endpoint: mostly fast, 5% of calls stuck for half a second
+        return 0.5 if rng.random() < 0.05 else rng.uniform(0.04, 0.08)
+
+    class SlowFakeChatModel(FakeListChatModel):
+        def _call(self, *args, **kwargs):
+            time.sleep(endpoint_latency())
+            return super()._call(*args, **kwargs)
+
+    class SlowFakeEmbeddings(Embeddings):
+        def embed_documents(self, texts):
+            return [self.embed_query(text) for text in texts]
+
+        def embed_query(self, text):
+            time.sleep(endpoint_latency())
+            return [float(len(text))] * 1024
+
+    def percentiles(latencies):
+        ordered = sorted(latencies)
+        return ordered[len(ordered) // 2], ordered[int(0.99 * (len(ordered) - 1))]
+
+    def measure(call, n=200):
+        latencies = []
+        for i in range(n):
+            start = time.perf_counter()
+            call(f"question {i}")
+            latencies.append(time.perf_counter() - start)
+        return percentiles(latencies)
+
+    model = SlowFakeChatModel(responses=["answer"])
+    embeddings = SlowFakeEmbeddings()
+    for name, plain, hedged in [
+        ("chat model", model, HedgedChatModel(model, Hedger(percentile=0.9, budget=0.1, initial_delay=0.1))),
+        ("embeddings", embeddings, HedgedEmbeddings(embeddings, Hedger(percentile=0.9, budget=0.1, initial_delay=0.1))),
+    ]:
+        call_plain = plain.invoke if name == "chat model" else plain.embed_query
+        call_hedged = hedged.invoke if name == "chat model" else hedged.embed_query
+        p50, p99 = measure(call_plain)
+        h50, h99 = measure(call_hedged)
+        print(f"{name}: p50 {p50 * 1000:.0f}ms -> {h50 * 1000:.0f}ms, p99 {p99 * 1000:.0f}ms -> {h99 * 1000:.0f}ms, {hedged.hedger.stats}")
+
+    async def cancelled_caller():
+        started = []
+
+        async def slow_call():
+            started.append(asyncio.current_task())
+            await asyncio.sleep(1)
+
+        hedger = Hedger(initial_delay=0.01)
+        caller = asyncio.ensure_future(hedger.arace(slow_call))
+        await asyncio.sleep(0.05) # primary and duplicate both running
+        caller.cancel()
+        await asyncio.gather(caller, return_exceptions=True)
+        await asyncio.sleep(0)
+        return [task.cancelled() for task in started]
+
+    requests = asyncio.run(cancelled_caller())
+    assert requests == [True, True], requests
+    print(f"caller cancelled: {len(requests)} in-flight requests cancelled")
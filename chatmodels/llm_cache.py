@@ -0,0 +1,208 @@
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from dotenv import load_dotenv
+import argparse
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+load_dotenv()
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_cache.db")
+
+# fields that decide what a model answers, read from the chat model and from the endpoint it wraps
+_IDENTITY_FIELDS = ("repo_id", "model_id", "model", "model_name", "endpoint_url", "provider", "task", "temperature",
+                    "max_new_tokens", "max_tokens", "top_p", "top_k", "repetition_penalty", "presence_penalty",
+                    "frequency_penalty", "do_sample", "seed", "stop", "stop_sequences", "model_kwargs")
+
+def model_identity(model):
+    """The model id and generation params of a chat model as a string. LangChain's llm_string can't be relied on
+    for them: ChatHuggingFace has no _identifying_params and is not serializable, so its llm_string is the same
+    `[('_type', 'huggingface-chat-wrapper'), ('stop', None)]` for every Hugging Face model."""
+    identity = {"type": type(model).__name__}
+    for prefix, source in (("", model), ("llm.", getattr(model, "llm", None))):
+        for name in _IDENTITY_FIELDS if source is not None else ():
+            value = getattr(source, name, None)
+            if value is not None and not callable(value):
+                identity[prefix + name] = value
+    return json.dumps(identity, sort_keys=True, default=repr)
+
+class SQLiteLLMCache(BaseCache):
+    """Persistent exact-match cache for chat model responses.
+
+    Give every model its own view with `model.cache = llm_cache.for_model(model)` (`get_chat_model(..., cache=llm_cache)`
+    does this), entries are keyed by that model's identity (model id + generation params, see `model_identity`),
+    LangChain's llm_string and the normalized messages. They expire after `ttl` seconds and the least recently used
+    ones are evicted once the cache grows past `max_bytes`.
+    Set `bypass=True` (or LLM_CACHE_BYPASS=1 in .env) to always hit the endpoint.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=7 * 24 * 3600, max_bytes=100 * 1024 * 1024, bypass=None, namespace=""):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.bypass = os.getenv("LLM_CACHE_BYPASS") == "1" if bypass is None else bypass
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+        self._lock = threading.Lock() # RunnableParallel branches share the cache from worker threads
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, llm_string TEXT, value TEXT, size INTEGER, created_at REAL, last_access REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access)")
+        self._conn.commit()
+
+    def for_model(self, model):
+        """A view of this cache whose keys include `model`'s identity. Views share the database, lock and stats."""
+        view = copy.copy(self)
+        view.namespace = model_identity(model)
+        return view
+
+    @staticmethod
+    def _normalize(prompt):
+        # chat models pass the serialized messages, message ids change on every run and must not change the key
+        try:
+            messages = json.loads(prompt)
+        except ValueError:
+            return prompt.strip()
+
+        def strip_ids(obj):
+            if isinstance(obj, dict):
+                return {k: strip_ids(v) for k, v in obj.items() if k != "id" or not isinstance(v, (str, type(None)))}
+            if isinstance(obj, list):
+                return [strip_ids(v) for v in obj]
+            return obj
+
+        return json.dumps(strip_ids(messages), sort_keys=True, separators=(",", ":"))
+
+    def _key(self, prompt, llm_string):
+        return hashlib.sha256(f"{self.namespace}\x00{llm_string}\x00{self._normalize(prompt)}".encode("utf-8")).hexdigest()
+
+    @property
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def lookup(self, prompt, llm_string):
+        if self.bypass:
+            return None
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            value, created_at = row
+            if self.ttl is not None and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.stats["hits"] += 1
+        return loads(value)
+
+    def update(self, prompt, llm_string, return_val):
+        if self.bypass:
+            return
+        key = self._key(prompt, llm_string)
+        value = dumps(list(return_val))
+        size = len(value.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, llm_string, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, llm_string, value, size, now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if self.max_bytes is None:
+            return
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access").fetchall():
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self.stats["evictions"] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+def check_models_do_not_share_entries():
+    """Two Hugging Face models asked the same prompt through one cache get their own answers."""
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+    from pydantic import BaseModel
+    from typing import Any
+    import tempfile
+
+    class EndpointStandIn(BaseModel):
+        repo_id: str
+        temperature: float = 0.8
+
+    class ChatStandIn(BaseChatModel):
+        # like ChatHuggingFace: no _identifying_params, the same llm_string for every model
+        llm: Any
+
+        @property
+        def _llm_type(self):
+            return "huggingface-chat-wrapper"
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=f"answer of {self.llm.repo_id}"))])
+
+    with tempfile.TemporaryDirectory() as directory:
+        llm_cache = SQLiteLLMCache(os.path.join(directory, "llm_cache.db"))
+        models = [ChatStandIn(llm=EndpointStandIn(repo_id=repo_id)) for repo_id in ("meta-llama/Llama-4-Scout-17B-16E-Instruct", "openai/gpt-oss-20b")]
+        models.append(ChatStandIn(llm=EndpointStandIn(repo_id="openai/gpt-oss-20b", temperature=0.1)))
+        assert len({model._get_llm_string() for model in models}) == 1 # what made them collide
+        for model in models:
+            model.cache = llm_cache.for_model(model)
+        for _ in range(2):
+            answers = [model.invoke("What is the capital of India").content for model in models]
+            assert answers == [f"answer of {model.llm.repo_id}" for model in models], answers
+        assert llm_cache.stats["hits"] == 3 and llm_cache.stats["misses"] == 3, llm_cache.stats
+        llm_cache._conn.close()
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--check", action="store_true", help="check that models sharing the cache get their own entries, then exit")
+    if arg_parser.parse_args().check:
+        check_models_do_not_share_entries()
+        print("models keep their own entries: ok")
+        raise SystemExit
+
+    from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+
+    llm_cache = SQLiteLLMCache()
+    llm = HuggingFaceEndpoint(
+        repo_id="openai/gpt-oss-20b",
+        task="text-generation"
+    )
+    model = ChatHuggingFace(llm=llm)
+    model.cache = llm_cache.for_model(model)
+
+    query = "What is the capital of India"
+    for run in ["first", "second"]:
+        start = time.perf_counter()
+        result = model.invoke(query)
+        print(f"{run} call: {time.perf_counter() - start:.3f}s ->", result.content)
+
+    print(llm_cache.stats, f"hit rate: {llm_cache.hit_rate:.0%}")
@@ -0,0 +1,205 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+import threading
+import time
+
+HTTP_POOL = {"max_connections": 32, "max_keepalive_connections": 16, "keepalive_expiry": 60.0}
+
+_clients = {}
+_scheduled_models = {} # chat key (+ cache) -> the shared chat model, or its copy with the cache, behind the scheduler
+_lock = threading.Lock()
+_building = {} # key -> Lock, so two threads asking for the same model don't both construct it
+stats = Counter()
+build_seconds = {}
+_pool = {"configured": False}
+
+def _freeze(value):
+    # hashable version of the params, unhashable objects (callbacks, clients) are keyed by identity
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return ("id", id(value))
+
+def _get_or_build(key, build):
+    client = _clients.get(key)
+    if client is not None:
+        stats["hits"] += 1
+        return client
+    with _lock:
+        key_lock = _building.setdefault(key, threading.Lock())
+    with key_lock:
+        client = _clients.get(key)
+        if client is not None:
+            stats["hits"] += 1
+            return client
+        start = time.perf_counter()
+        client = build()
+        build_seconds[key] = time.perf_counter() - start
+        stats["constructions"] += 1
+        _clients[key] = client
+        return client
+
+#---- builders, provider libraries are imported only when a client of that provider is first needed ----
+
+def _ensure_pool():
+    if not _pool["configured"]:
+        configure_http_pool()
+
+def _build_endpoint(repo_id, task, params):
+    _ensure_pool()
+    from langchain_huggingface import HuggingFaceEndpoint
+    return HuggingFaceEndpoint(repo_id=repo_id, task=task, **params)
+
+def _build_chat_model(provider, model, params):
+    if provider == "huggingface":
+        from langchain_huggingface import ChatHuggingFace
+        task = params.pop("task", "text-generation")
+        return ChatHuggingFace(llm=get_endpoint(model, task=task, **params))
+    if provider == "google":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        return ChatGoogleGenerativeAI(model=model, **params)
+    raise ValueError(f"Unknown provider {provider!r}, expected 'huggingface' or 'google'")
+
+def _build_embeddings(provider, model, params):
+    if provider == "huggingface":
+        _ensure_pool()
+        from langchain_huggingface import HuggingFaceEndpointEmbeddings
+        return HuggingFaceEndpointEmbeddings(repo_id=model, **params)
+    if provider == "google":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        return GoogleGenerativeAIEmbeddings(model=model, **params)
+    raise ValueError(f"Unknown provider {provider!r}, expected 'huggingface' or 'google'")
+
+#---- public api ----
+
+def get_endpoint(repo_id, task="text-generation", **params):
+    """Shared HuggingFaceEndpoint for (repo_id, task, params), built on first use."""
+    key = ("endpoint", repo_id, task, _freeze(params))
+    return _get_or_build(key, lambda: _build_endpoint(repo_id, task, params))
+
+def _scheduled(chat_model):
+    from chatmodels.model_scheduler import scheduled
+    return scheduled(chat_model)
+
+def get_chat_model(model, provider="huggingface", cache=None, **params):
+    """Shared chat model for (provider, model, params), built on first use and routed through the
+    model scheduler, so every script shares the provider's rate limits and retries on 429.
+
+    `cache` is applied on a shallow copy, so scripts with and without an LLM cache still share
+    the same endpoint client underneath. A SQLiteLLMCache is narrowed to the model with `for_model`."""
+    key = ("chat", provider, model, _freeze(params))
+    shared = _get_or_build(key, lambda: _build_chat_model(provider, model, dict(params)))
+    if cache is not None:
+        key += (("cache", id(cache)),) # the copy holds the cache, so its id is not reused while the entry exists
+    scheduled_model = _scheduled_models.get(key)
+    if scheduled_model is None:
+        with _lock:
+            scheduled_model = _scheduled_models.get(key)
+            if scheduled_model is None:
+                if cache is not None and hasattr(cache, "for_model"): # SQLiteLLMCache keys on the model's identity
+                    cache = cache.for_model(shared)
+                scheduled_model = _scheduled(shared if cache is None else shared.model_copy(update={"cache": cache}))
+                _scheduled_models[key] = scheduled_model
+    return scheduled_model
+
+def get_embeddings(model, provider="huggingface", **params):
+    key = ("embeddings", provider, model, _freeze(params))
+    return _get_or_build(key, lambda: _build_embeddings(provider, model, params))
+
+def configure_http_pool(max_connections=None, max_keepalive_connections=None, keepalive_expiry=None):
+    """One keep-alive connection pool for every Hugging Face client in the process.
+
+    huggingface_hub >= 1.0 talks through a process wide httpx client, here it gets explicit pool limits.
+    Older versions use requests, there every thread gets a session with a pooled HTTPAdapter."""
+    for name, value in (("max_connections", max_connections), ("max_keepalive_connections", max_keepalive_connections),
+                        ("keepalive_expiry", keepalive_expiry)):
+        if value is not None:
+            HTTP_POOL[name] = value
+    try:
+        import huggingface_hub
+    except ImportError:
+        return False
+
+    if hasattr(huggingface_hub, "set_client_factory"):
+        import httpx
+        # keep the event hooks of the clients huggingface_hub builds (auth headers, error handling), only add pool limits
+        hooks = huggingface_hub.get_session().event_hooks
+        async_hooks = huggingface_hub.get_async_session().event_hooks
+        limits = httpx.Limits(**HTTP_POOL)
+        huggingface_hub.set_client_factory(lambda: httpx.Client(
+            limits=limits, event_hooks=hooks, follow_redirects=True, timeout=None
+        ))
+        huggingface_hub.set_async_client_factory(lambda: httpx.AsyncClient(
+            limits=limits, event_hooks=async_hooks, follow_redirects=True, timeout=None
+        ))
+        _pool["configured"] = True
+        return True
+
+    if hasattr(huggingface_hub, "configure_http_backend"):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        def backend_factory():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL["max_keepalive_connections"], pool_maxsize=HTTP_POOL["max_connections"])
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            return session
+
+        huggingface_hub.configure_http_backend(backend_factory=backend_factory)
+        _pool["configured"] = True
+        return True
+    return False
+
+def warm_up(*models, provider="huggingface", ping=False, **params):
+    """Builds the given chat models in parallel before the first request. With `ping=True` each one
+    also answers a one token prompt, which opens the pooled TLS connection ahead of real traffic."""
+
+    def warm(model):
+        start = time.perf_counter()
+        chat_model = get_chat_model(model, provider=provider, **params)
+        if ping:
+            chat_model.invoke("ping", max_tokens=1)
+        return model, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=max(1, len(models))) as executor:
+        return dict(executor.map(warm, models))
+
+def prefetch(*models, provider="huggingface", **params):
+    """warm_up in a background thread. Interactive scripts call it before their first input(), the provider
+    library is imported while the user types and get_chat_model() later just waits for it to finish."""
+    thread = threading.Thread(target=warm_up, args=models, kwargs={"provider": provider, **params}, daemon=True)
+    thread.start()
+    return thread
+
+def clear():
+    with _lock:
+        _clients.clear()
+        _scheduled_models.clear()
+        _building.clear()
+        build_seconds.clear()
+        stats.clear()
+
+if __name__ == "__main__":
+    from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    repo_id = "meta-llama/Llama-4-Scout-17B-16E-Instruct"
+    start = time.perf_counter()
+    for _ in range(20):
+        ChatHuggingFace(llm=HuggingFaceEndpoint(repo_id=repo_id, task="text-generation"))
+    print(f"20 chains building their own client: {1000 * (time.perf_counter() - start):.1f}ms")
+
+    start = time.perf_counter()
+    for _ in range(20):
+        get_chat_model(repo_id)
+    print(f"20 chains sharing the registry client: {1000 * (time.perf_counter() - start):.1f}ms, {dict(stats)}")
+
+    print("warm up:", warm_up(repo_id, "meta-llama/Llama-3.3-70B-Instruct"))
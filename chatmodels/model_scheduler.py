@@ -0,0 +1,389 @@
+from langchain_core.runnables import Runnable
+from collections import defaultdict
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+# requests/tokens per minute and concurrent calls, per (provider, model) unless configured otherwise
+DEFAULT_LIMITS = {
+    "huggingface": {"requests_per_minute": 60, "tokens_per_minute": 100_000, "max_concurrency": 4},
+    "google": {"requests_per_minute": 15, "tokens_per_minute": 250_000, "max_concurrency": 4},
+}
+FALLBACK_LIMITS = {"requests_per_minute": 60, "tokens_per_minute": 100_000, "max_concurrency": 4}
+
+class TokenBucket:
+    def __init__(self, per_minute, burst_seconds=10):
+        self.capacity = max(1.0, per_minute * burst_seconds / 60.0)
+        self.tokens = self.capacity
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, scale):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate * scale)
+        self.updated = now
+
+    def wait_time(self, amount, scale):
+        self._refill(scale)
+        amount = min(amount, self.capacity) # a single huge prompt must still be able to go through
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / (self.rate * scale)
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+class _ProviderState:
+    def __init__(self, requests_per_minute, tokens_per_minute, max_concurrency):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.queue = [] # (priority, sequence, ticket)
+        self.rate_scale = 1.0 # AIMD: halved on every 429, recovers slowly on success
+        self.backoff_until = 0.0
+        self.consecutive_429 = 0
+
+class ModelScheduler:
+    """Shared gate for every model call: token buckets on requests and tokens per (provider, model),
+    bounded concurrency, priority classes (interactive before batch) and adaptive backoff on HTTP 429."""
+
+    def __init__(self):
+        self._states = {}
+        self._limits = {}
+        self._condition = threading.Condition()
+        self._sequence = itertools.count()
+        self._waits = defaultdict(list)
+        self._async_waiters = set() # (loop, asyncio.Event) of coroutines waiting in aacquire
+        self.counters = defaultdict(int)
+
+    def configure(self, provider, model, requests_per_minute, tokens_per_minute, max_concurrency):
+        with self._condition:
+            self._limits[(provider, model)] = (requests_per_minute, tokens_per_minute, max_concurrency)
+            self._states.pop((provider, model), None)
+
+    def _state(self, key):
+        if key not in self._states:
+            limits = self._limits.get(key)
+            if limits is None:
+                default = DEFAULT_LIMITS.get(key[0], FALLBACK_LIMITS)
+                limits = (default["requests_per_minute"], default["tokens_per_minute"], default["max_concurrency"])
+            self._states[key] = _ProviderState(*limits)
+        return self._states[key]
+
+    def _try_grant(self, state, key, ticket, priority, tokens, enqueued):
+        """Takes a slot for `ticket` if it is first in line and the buckets allow it. Returns (granted,
+        seconds until it may be allowed, None when only a release can change that). Call with the lock held."""
+        now = time.monotonic()
+        if state.queue[0][2] is not ticket or state.in_flight >= state.max_concurrency:
+            return False, None
+        timeout = max(
+            state.backoff_until - now,
+            state.requests.wait_time(1, state.rate_scale),
+            state.tokens.wait_time(tokens, state.rate_scale)
+        )
+        if timeout > 0:
+            return False, timeout
+        heapq.heappop(state.queue)
+        state.requests.take(1)
+        state.tokens.take(tokens)
+        state.in_flight += 1
+        self._waits[(key, priority)].append(now - enqueued)
+        self._notify() # the next ticket in line may be allowed too
+        return True, None
+
+    def _abandon(self, state, ticket):
+        # a waiter that gave up (cancelled task, KeyboardInterrupt) leaves the queue without taking a slot
+        state.queue = [entry for entry in state.queue if entry[2] is not ticket]
+        heapq.heapify(state.queue)
+        self._notify()
+
+    def _notify(self):
+        self._condition.notify_all()
+        for loop, event in list(self._async_waiters):
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError: # the loop was closed
+                self._async_waiters.discard((loop, event))
+
+    def acquire(self, key, priority="interactive", tokens=1):
+        ticket = object()
+        enqueued = time.monotonic()
+        with self._condition:
+            state = self._state(key)
+            heapq.heappush(state.queue, (PRIORITIES[priority], next(self._sequence), ticket))
+            try:
+                while True:
+                    granted, timeout = self._try_grant(state, key, ticket, priority, tokens, enqueued)
+                    if granted:
+                        return
+                    self._condition.wait(timeout)
+            except BaseException:
+                self._abandon(state, ticket)
+                raise
+
+    async def aacquire(self, key, priority="interactive", tokens=1):
+        """acquire for coroutines: waits on an asyncio.Event instead of a thread, so waiting calls don't
+        use up the default executor, and a cancelled waiter leaves the queue without taking a slot."""
+        ticket = object()
+        enqueued = time.monotonic()
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._condition:
+            state = self._state(key)
+            heapq.heappush(state.queue, (PRIORITIES[priority], next(self._sequence), ticket))
+            self._async_waiters.add(waiter)
+        try:
+            while True:
+                with self._condition:
+                    granted, timeout = self._try_grant(state, key, ticket, priority, tokens, enqueued)
+                    if granted:
+                        return
+                    waiter[1].clear() # set again by any release from here on
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._condition:
+                self._abandon(state, ticket)
+            raise
+        finally:
+            with self._condition:
+                self._async_waiters.discard(waiter)
+
+    def release(self, key, rate_limited=False, token_correction=0):
+        with self._condition:
+            state = self._state(key)
+            state.in_flight -= 1
+            state.tokens.tokens = min(state.tokens.capacity, state.tokens.tokens + token_correction) # estimate minus actual usage
+            if rate_limited:
+                self.counters["rate_limited"] += 1
+                state.consecutive_429 += 1
+                state.rate_scale = max(state.rate_scale / 2, 0.05)
+                delay = min(60.0, 2 ** state.consecutive_429) * random.uniform(0.5, 1.0)
+                state.backoff_until = max(state.backoff_until, time.monotonic() + delay)
+            else:
+                state.consecutive_429 = 0
+                state.rate_scale = min(1.0, state.rate_scale + 0.05)
+            self._notify()
+
+    def count_retry(self):
+        with self._condition:
+            self.counters["retries"] += 1
+
+    def metrics(self):
+        with self._condition:
+            report = {}
+            for (key, priority), waits in self._waits.items():
+                ordered = sorted(waits)
+                report[f"{key[0]}/{key[1]}/{priority}"] = {
+                    "calls": len(ordered),
+                    "mean_queue_wait_s": sum(ordered) / len(ordered),
+                    "p95_queue_wait_s": ordered[int(0.95 * (len(ordered) - 1))],
+                    "max_queue_wait_s": ordered[-1]
+                }
+            report["rate_limited"] = self.counters["rate_limited"]
+            report["retries"] = self.counters["retries"]
+            return report
+
+scheduler = ModelScheduler()
+
+RATE_LIMIT_ERRORS = ("ResourceExhausted", "RateLimitError", "TooManyRequests") # google.api_core, openai, generic
+
+def _is_rate_limit(error):
+    # HTTP 429 from the status code or the exception type, also when wrapped by the provider library
+    while error is not None:
+        for status in (getattr(error, "status_code", None), getattr(error, "code", None),
+                       getattr(getattr(error, "response", None), "status_code", None)):
+            if status == 429:
+                return True
+        if type(error).__name__ in RATE_LIMIT_ERRORS:
+            return True
+        error = error.__cause__
+    return False
+
+def _model_key(model):
+    name = type(model).__name__
+    if "HuggingFace" in name:
+        llm = getattr(model, "llm", None)
+        return "huggingface", getattr(model, "model_id", None) or getattr(llm, "repo_id", None) or name
+    if "Google" in name:
+        return "google", getattr(model, "model", name)
+    return name, getattr(model, "model", None) or getattr(model, "model_name", None) or name
+
+def _estimate_tokens(model, input):
+    text = input.to_string() if hasattr(input, "to_string") else str(input)
+    llm = getattr(model, "llm", model)
+    completion = getattr(llm, "max_new_tokens", None) or getattr(llm, "max_output_tokens", None) or 512
+    return len(text) // 4 + completion
+
+def _used_tokens(result):
+    usage = getattr(result, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+class ScheduledModel(Runnable):
+    """Routes a chat model through the shared scheduler and retries on 429 after the scheduler's backoff.
+    Streams are retried only while nothing was yielded yet. Everything else (bind_tools, with_structured_output,
+    attributes like `llm`) is forwarded to the model, and the models it returns are scheduled too."""
+
+    def __init__(self, model, priority="interactive", max_retries=5, scheduler=scheduler, chat_model=None):
+        self.model = model
+        self.chat_model = chat_model or model # the underlying chat model, for the limits key and token estimate
+        self.priority = priority
+        self.max_retries = max_retries
+        self.scheduler = scheduler
+        self.key = _model_key(self.chat_model)
+        self.name = f"Scheduled[{model.get_name()}]"
+
+    def __getattr__(self, name):
+        if name == "model": # not set yet, e.g. while unpickling
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def _wrap(self, runnable):
+        return ScheduledModel(runnable, self.priority, self.max_retries, self.scheduler, self.chat_model)
+
+    def bind_tools(self, tools, **kwargs):
+        return self._wrap(self.model.bind_tools(tools, **kwargs))
+
+    def with_structured_output(self, schema, **kwargs):
+        return self._wrap(self.model.with_structured_output(schema, **kwargs))
+
+    def get_input_schema(self, config=None):
+        return self.model.get_input_schema(config)
+
+    def get_output_schema(self, config=None):
+        return self.model.get_output_schema(config)
+
+    def _retry(self, limited, attempt):
+        if limited and attempt < self.max_retries:
+            self.scheduler.count_retry()
+            return True
+        return False
+
+    def invoke(self, input, config=None, **kwargs):
+        estimate = _estimate_tokens(self.chat_model, input)
+        for attempt in range(self.max_retries + 1):
+            self.scheduler.acquire(self.key, self.priority, estimate)
+            limited, used = False, None
+            try:
+                result = self.model.invoke(input, config, **kwargs)
+                used = _used_tokens(result)
+                return result
+            except Exception as e:
+                limited = _is_rate_limit(e)
+                if not self._retry(limited, attempt):
+                    raise
+            finally: # also on KeyboardInterrupt, the slot is always given back
+                self.scheduler.release(self.key, rate_limited=limited, token_correction=estimate - used if used else 0)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        estimate = _estimate_tokens(self.chat_model, input)
+        for attempt in range(self.max_retries + 1):
+            await self.scheduler.aacquire(self.key, self.priority, estimate)
+            limited, used = False, None
+            try:
+                result = await self.model.ainvoke(input, config, **kwargs)
+                used = _used_tokens(result)
+                return result
+            except Exception as e:
+                limited = _is_rate_limit(e)
+                if not self._retry(limited, attempt):
+                    raise
+            finally: # also when the task is cancelled mid call
+                self.scheduler.release(self.key, rate_limited=limited, token_correction=estimate - used if used else 0)
+
+    def stream(self, input, config=None, **kwargs):
+        estimate = _estimate_tokens(self.chat_model, input)
+        for attempt in range(self.max_retries + 1):
+            self.scheduler.acquire(self.key, self.priority, estimate)
+            limited, streamed = False, False
+            try:
+                for chunk in self.model.stream(input, config, **kwargs):
+                    streamed = True
+                    yield chunk
+                return
+            except Exception as e:
+                limited = _is_rate_limit(e)
+                if streamed or not self._retry(limited, attempt): # a retry would repeat what was yielded
+                    raise
+            finally:
+                self.scheduler.release(self.key, rate_limited=limited)
+
+    async def astream(self, input, config=None, **kwargs):
+        estimate = _estimate_tokens(self.chat_model, input)
+        for attempt in range(self.max_retries + 1):
+            await self.scheduler.aacquire(self.key, self.priority, estimate)
+            limited, streamed = False, False
+            try:
+                async for chunk in self.model.astream(input, config, **kwargs):
+                    streamed = True
+                    yield chunk
+                return
+            except Exception as e:
+                limited = _is_rate_limit(e)
+                if streamed or not self._retry(limited, attempt):
+                    raise
+            finally:
+                self.scheduler.release(self.key, rate_limited=limited)
+
+def scheduled(model, priority="interactive", max_retries=5):
+    if isinstance(model, ScheduledModel): # models from get_chat_model are scheduled already
+        return ScheduledModel(model.model, priority, max_retries, model.scheduler, model.chat_model)
+    return ScheduledModel(model, priority=priority, max_retries=max_retries)
+
+if __name__ == "__main__":
+    from langchain_core.language_models import FakeListChatModel
+    from concurrent.futures import ThreadPoolExecutor
+
+    class TooManyRequests(Exception):
+        status_code = 429
+
+    class RateLimitedFakeModel(FakeListChatModel):
+        # local stand-in for an endpoint that answers 429 above 5 requests per second
+        calls: list = []
+
+        def _call(self, *args, **kwargs):
+            now = time.monotonic()
+            self.calls[:] = [t for t in self.calls if now - t < 1.0] + [now]
+            if len(self.calls) > 5:
+                raise TooManyRequests("Too Many Requests")
+            time.sleep(0.05)
+            return super()._call(*args, **kwargs)
+
+    model = RateLimitedFakeModel(responses=["ok"])
+    scheduler.configure("RateLimitedFakeModel", "RateLimitedFakeModel", requests_per_minute=360, tokens_per_minute=1_000_000, max_concurrency=4)
+    batch_model = scheduled(model, priority="batch")
+    interactive_model = scheduled(model, priority="interactive")
+
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        jobs = [executor.submit(batch_model.invoke, f"batch job {i}") for i in range(40)]
+        time.sleep(0.5)
+        jobs += [executor.submit(interactive_model.invoke, f"user question {i}") for i in range(5)]
+        for job in jobs:
+            job.result()
+
+    for name, value in scheduler.metrics().items():
+        print(name, value)
+
+    assert not _is_rate_limit(ValueError("order #4291 not found")) # only the status code or the type count
+
+    async def cancelled_waiters():
+        # 50 coroutines queue for 4 slots without a thread each, half of them give up while waiting
+        scheduler.configure("RateLimitedFakeModel", "RateLimitedFakeModel", requests_per_minute=6000, tokens_per_minute=10_000_000, max_concurrency=4)
+        model.calls.clear()
+        tasks = [asyncio.create_task(batch_model.ainvoke(f"async job {i}")) for i in range(50)]
+        await asyncio.sleep(0.05)
+        for task in tasks[25:]:
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        state = scheduler._state(batch_model.key)
+        print(f"async: {sum(getattr(result, 'content', None) == 'ok' for result in results)} answered, "
+              f"{sum(isinstance(result, asyncio.CancelledError) for result in results)} cancelled, "
+              f"{state.in_flight} slots still held, {len(state.queue)} tickets left in the queue")
+        assert state.in_flight == 0 and not state.queue
+
+    asyncio.run(cancelled_waiters())
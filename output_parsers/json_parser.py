@@ -1,16 +1,13 @@
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
 from langchain_core.output_parsers import  JsonOutputParser
 from langchain_core.prompts import PromptTemplate
 from dotenv import load_dotenv
 
-load_dotenv()
+from chatmodels.model_registry import get_chat_model
+from output_parsers.streaming_json_parser import StreamingJsonParser
 
-llm = HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-4-Scout-17B-16E-Instruct",
-    task="text-generation"
-)
+load_dotenv()
 
-model = ChatHuggingFace(llm=llm)
+model = get_chat_model("meta-llama/Llama-4-Scout-17B-16E-Instruct")
 parser = JsonOutputParser()
 
 template = PromptTemplate(
@@ -26,4 +23,7 @@ template = PromptTemplate(
 
 chain = template | model | parser # Above Commented code using chains
 
-print(chain.invoke({"movie":"Titanic"}))
\ No newline at end of file
+# print(chain.invoke({"movie":"Titanic"}))
+streaming_chain = template | model | StreamingJsonParser() # same result, fields show up while the model is still writing
+for partial in streaming_chain.stream({"movie":"Titanic"}):
+    print(partial)
\ No newline at end of file
@@ -0,0 +1,472 @@
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import BaseOutputParser, StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from pydantic import Field, PrivateAttr
+from functools import lru_cache
+from typing import Any
+import threading
+import json
+import re
+
+_NUMBER = re.compile(r"^-?(0|[1-9]\d*)(\.\d+)?([eE][-+]?\d+)?$")
+_WORD = re.compile(r"[A-Za-z0-9_+\-.$]+")
+_LITERALS = {"true": "true", "false": "false", "null": "null", "True": "true", "False": "false", "None": "null",
+             "NaN": "null", "undefined": "null"}
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "/": "/", "\\": "\\", '"': '"', "'": "'"}
+_CLOSERS = {"{": "}", "[": "]"}
+
+_BARE_VALUE = re.compile(r'[^,\]\}"\n]*') # an unquoted value runs to the next delimiter, spaces included
+
+class _Lossy(Exception):
+    """Raised inside the repair when a fix would drop or reinterpret content, that start is given up."""
+
+def _read_string(text, i, quote, repairs):
+    """Decodes the string starting after the `quote` at text[i - 1]. Returns (value, index after it).
+    A single quote only ends the string before a delimiter, in "don't" it is an apostrophe."""
+    chars = []
+    n = len(text)
+    while i < n:
+        char = text[i]
+        if char == quote:
+            if quote == '"':
+                return "".join(chars), i + 1
+            following = text[i + 1:].lstrip()
+            if not following or following[0] in ",:}]":
+                return "".join(chars), i + 1
+        if char == "\\" and i + 1 < n:
+            escaped = text[i + 1]
+            if escaped == "u" and re.match(r"[0-9a-fA-F]{4}", text[i + 2:i + 6]):
+                chars.append(chr(int(text[i + 2:i + 6], 16)))
+                i += 6
+                continue
+            chars.append(_ESCAPES.get(escaped, escaped))
+            i += 2
+            continue
+        if char < " ":
+            repairs.append("escaped a raw control character")
+        chars.append(char) # json.dumps escapes it
+        i += 1
+    repairs.append("closed a truncated string")
+    return "".join(chars), n
+
+def _top_level_starts(text):
+    """Positions of the { and [ that are not inside an earlier bracket (or a double quoted string)."""
+    starts, depth, i, n = [], 0, 0, len(text)
+    while i < n:
+        char = text[i]
+        if char == '"' and depth:
+            i += 1
+            while i < n and text[i] != '"':
+                i += 2 if text[i] == "\\" else 1
+        elif char in "{[":
+            if depth == 0:
+                starts.append(i)
+            depth += 1
+        elif char in "}]" and depth:
+            depth -= 1
+        i += 1
+    return starts
+
+def repair_json(text):
+    """Parses almost-JSON the way models tend to get it wrong. Returns (value, repairs), `repairs` naming
+    every fix that was needed (empty for valid JSON).
+
+    One left to right pass re-emits the input as JSON tokens: ```json fences and text around the value are
+    skipped, single quoted strings, unquoted keys and values, Python literals and comments are accepted,
+    missing commas are added and trailing ones dropped, and brackets still open at the end (a truncated answer)
+    are closed. Only lossless repairs are made: a fix that would drop content or guess at structure (a stray
+    bracket or colon, a key without a value, an incomplete literal like `tru`) gives up that start and the
+    next top level { or [ is tried. If none repairs cleanly OutputParserException is raised, so the caller
+    re-asks the model instead of using wrong data."""
+    stripped = text.strip()
+    try:
+        return json.loads(stripped), []
+    except ValueError:
+        pass
+    starts = _top_level_starts(stripped)
+    if not starts:
+        raise OutputParserException(f"No JSON object found in the output: {text[:200]!r}", llm_output=text)
+    reasons = []
+    for start in starts:
+        try:
+            return _repair_from(stripped, start)
+        except _Lossy as e:
+            reasons.append(f"at character {start}: {e}")
+    raise OutputParserException(f"Could not repair the JSON without losing content ({'; '.join(reasons[:3])})", llm_output=text)
+
+def _repair_from(stripped, start):
+    repairs = []
+    if start > 0:
+        repairs.append("skipped text before the JSON" if not stripped.startswith("```") else "stripped a code fence")
+
+    out = [] # JSON tokens
+    stack = [] # [opener, expecting ("key", "colon", "value", "comma"), index in `out` where the member started]
+    i, n = start, len(stripped)
+
+    def value_allowed():
+        # adds a missing comma when a value follows another value
+        top = stack[-1]
+        if top[1] == "comma":
+            out.append(",")
+            repairs.append("added a missing comma")
+            top[1] = "key" if top[0] == "{" else "value"
+            top[2] = len(out)
+
+    def value_done():
+        if stack:
+            stack[-1][1] = "comma"
+
+    def close(opener, expecting):
+        if out[-1] == ",":
+            out.pop()
+            repairs.append("removed a trailing comma")
+        elif expecting in ("colon", "value") and opener == "{":
+            raise _Lossy("a key without a value")
+        out.append(_CLOSERS[opener])
+
+    while i < n and (stack or not out):
+        char = stripped[i]
+        if char in " \t\r\n":
+            i += 1
+            continue
+        if stripped.startswith("//", i) or stripped.startswith("#", i):
+            end = stripped.find("\n", i)
+            i = n if end < 0 else end
+            repairs.append("removed a comment")
+            continue
+        if stripped.startswith("/*", i):
+            end = stripped.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            repairs.append("removed a comment")
+            continue
+        if char in "{[":
+            if stack:
+                top = stack[-1]
+                if top[1] in ("key", "colon") or (top[0] == "{" and top[1] == "comma"):
+                    raise _Lossy(f"a {char} where a key or colon belongs")
+                value_allowed()
+            out.append(char)
+            stack.append([char, "key" if char == "{" else "value", len(out)])
+            i += 1
+            continue
+        if char in "}]":
+            i += 1
+            if not any(_CLOSERS[opener] == char for opener, _, _ in stack):
+                raise _Lossy(f"an unmatched {char}")
+            while True:
+                opener, expecting, _ = stack.pop()
+                close(opener, expecting)
+                value_done()
+                if _CLOSERS[opener] == char:
+                    break
+                repairs.append(f"closed an unclosed {opener}")
+            continue
+        top = stack[-1]
+        if char == ":":
+            if top[1] != "colon":
+                raise _Lossy("a stray colon")
+            out.append(":")
+            top[1] = "value"
+            i += 1
+            continue
+        if char == ",":
+            if top[1] != "comma":
+                raise _Lossy("an extra comma")
+            out.append(",")
+            top[1] = "key" if top[0] == "{" else "value"
+            top[2] = len(out)
+            i += 1
+            continue
+        is_key = top[0] == "{" and top[1] in ("key", "comma")
+        if char in "\"'":
+            value, i = _read_string(stripped, i + 1, char, repairs)
+            if char == "'":
+                repairs.append("converted a single quoted string")
+            token = json.dumps(value, ensure_ascii=False)
+        else:
+            match = _WORD.match(stripped, i)
+            if match is None:
+                raise _Lossy(f"an unexpected {char!r}")
+            word = match.group()
+            if is_key:
+                token, i = json.dumps(word), match.end()
+                repairs.append("quoted an unquoted key")
+            elif word in _LITERALS:
+                token, i = _LITERALS[word], match.end()
+                if token != word:
+                    repairs.append(f"converted {word} to {token}")
+            elif _NUMBER.match(word):
+                token, i = word, match.end()
+            elif _NUMBER.match(word.lstrip("+")) or re.match(r"^-?\d*\.\d+$|^-?\d+\.$", word):
+                token, i = json.dumps(float(word)), match.end()
+                repairs.append(f"normalized the number {word}")
+            elif any(literal.startswith(word) for literal in _LITERALS):
+                raise _Lossy(f"an incomplete literal {word!r}")
+            else:
+                phrase = _BARE_VALUE.match(stripped, i).group().rstrip()
+                token, i = json.dumps(phrase, ensure_ascii=False), i + len(phrase)
+                repairs.append("quoted an unquoted value")
+        if is_key:
+            if top[1] == "comma":
+                value_allowed()
+            out.append(token)
+            top[1] = "colon"
+            continue
+        if top[1] == "colon":
+            raise _Lossy("a missing colon")
+        value_allowed()
+        out.append(token)
+        value_done()
+
+    after = stripped[i:].strip().strip("`").strip()
+    if after[:1] in (",", ":", "}", "]"):
+        raise _Lossy(f"JSON continuing after the value closed: {after[:20]!r}")
+    if after:
+        repairs.append("skipped text after the JSON")
+    if stack:
+        repairs.append("closed brackets of a truncated answer")
+    while stack:
+        opener, expecting, _ = stack.pop()
+        close(opener, expecting)
+        value_done()
+    try:
+        return json.loads("".join(out)), repairs
+    except ValueError as e:
+        raise _Lossy(f"still invalid: {e}") from None
+
+@lru_cache(maxsize=None)
+def _model_schema(pydantic_object):
+    return pydantic_object.model_json_schema()
+
+def _resolve(schema, defs):
+    while "$ref" in schema:
+        schema = defs[schema["$ref"].rsplit("/", 1)[-1]]
+    return schema
+
+def coerce_to_schema(value, schema, repairs, defs=None):
+    """Nudges parsed JSON towards a JSON schema: "1997" for an integer, a lone string for an array, "yes" for a
+    boolean, keys differing only in case, spaces or dashes. Anything it can't fix is left for the validator."""
+    defs = defs if defs is not None else schema.get("$defs", {})
+    schema = _resolve(schema, defs)
+    options = schema.get("anyOf") or schema.get("oneOf")
+    if options:
+        if value is None and any(_resolve(option, defs).get("type") == "null" for option in options):
+            return value
+        schema = next((_resolve(option, defs) for option in options if _resolve(option, defs).get("type") != "null"), schema)
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        if value is None and "null" in kind:
+            return value
+        kind = next((k for k in kind if k != "null"), None)
+    if kind == "object" and isinstance(value, dict):
+        properties = schema.get("properties", {})
+        normalized = {re.sub(r"[\s_\-]", "", name).lower(): name for name in properties}
+        result = {}
+        for key, item in value.items():
+            name = key if key in properties else normalized.get(re.sub(r"[\s_\-]", "", key).lower(), key)
+            if name != key:
+                repairs.append(f"renamed key {key!r} to {name!r}")
+            result[name] = coerce_to_schema(item, properties[name], repairs, defs) if name in properties else item
+        return result
+    if kind == "array":
+        if not isinstance(value, list):
+            repairs.append("wrapped a single value in a list")
+            value = [] if value is None else [value]
+        return [coerce_to_schema(item, schema.get("items", {}), repairs, defs) for item in value]
+    if kind in ("integer", "number") and isinstance(value, str):
+        cleaned = value.strip().replace(",", "")
+        try:
+            number = float(cleaned)
+        except ValueError:
+            return value
+        repairs.append(f"converted {value!r} to a number")
+        return int(number) if kind == "integer" and number.is_integer() else number
+    if kind == "integer" and isinstance(value, float) and value.is_integer():
+        return int(value)
+    if kind == "boolean" and isinstance(value, str) and value.strip().lower() in ("true", "yes", "false", "no"):
+        repairs.append(f"converted {value!r} to a boolean")
+        return value.strip().lower() in ("true", "yes")
+    if kind == "string" and isinstance(value, (int, float)) and not isinstance(value, bool):
+        repairs.append(f"converted {value!r} to a string")
+        return str(value)
+    if kind == "string" and isinstance(value, list) and len(value) == 1 and isinstance(value[0], str):
+        repairs.append("unwrapped a one element list")
+        return value[0]
+    return value
+
+REASK_PROMPT = PromptTemplate.from_template(
+    "The text below should be JSON but could not be parsed.\nError: {error}\n\nText:\n{completion}\n\n"
+    "{format_instructions}\nReply with the corrected JSON only."
+)
+
+class RepairingOutputParser(BaseOutputParser):
+    """Wraps a JsonOutputParser or PydanticOutputParser with a local repair stage.
+
+    Every answer goes through `repair_json` (plus schema-guided coercion for Pydantic parsers) before the wrapped
+    parser, so valid JSON costs one json.loads and broken JSON is fixed locally, in microseconds. The wrapped
+    parser is not given the raw answer, its partial JSON parsing would silently drop a truncated `"b": tru`.
+    When no lossless repair exists the model is asked again, if a `reask_chain` is set (see `from_llm`),
+    otherwise the error is raised. `stats` counts how every answer ended: clean, repaired, reasked or failed."""
+
+    parser: BaseOutputParser
+    reask_chain: Any = None # prompt | llm | StrOutputParser, called with error, completion and format_instructions
+    max_reasks: int = 1
+    stats: dict = Field(default_factory=lambda: {"clean": 0, "repaired": 0, "reasked": 0, "failed": 0})
+    repair_log: list = Field(default_factory=list) # (repairs, answer) of the last 100 repaired answers
+    _lock: Any = PrivateAttr(default_factory=threading.Lock) # parse runs on the threads of batch()
+
+    @classmethod
+    def from_llm(cls, llm, parser, max_reasks=1):
+        return cls(parser=parser, reask_chain=REASK_PROMPT | llm | StrOutputParser(), max_reasks=max_reasks)
+
+    @property
+    def _type(self):
+        return "repairing_output_parser"
+
+    def get_format_instructions(self):
+        return self.parser.get_format_instructions()
+
+    def _repair(self, completion):
+        value, repairs = repair_json(completion)
+        schema_owner = getattr(self.parser, "pydantic_object", None)
+        if schema_owner is not None:
+            value = coerce_to_schema(value, _model_schema(schema_owner), repairs)
+        return self.parser.parse(json.dumps(value, ensure_ascii=False)), repairs
+
+    def _count(self, outcome, repairs=(), completion=None):
+        with self._lock:
+            self.stats[outcome] += 1
+            if repairs:
+                self.repair_log.append((repairs, completion))
+                del self.repair_log[:-100]
+
+    def parse(self, completion):
+        try:
+            parsed, repairs = self._repair(completion)
+            self._count("repaired" if repairs else "clean", repairs, completion)
+            return parsed
+        except OutputParserException as e:
+            error = e
+        for _ in range(self.max_reasks if self.reask_chain is not None else 0):
+            completion = self.reask_chain.invoke({
+                "error": str(error).split("\n")[0], "completion": completion,
+                "format_instructions": self.parser.get_format_instructions()
+            })
+            try:
+                parsed, repairs = self._repair(completion)
+                self._count("reasked", repairs, completion)
+                return parsed
+            except OutputParserException as e:
+                error = e
+        self._count("failed")
+        raise error
+
+def _movie_corpus():
+    """A Pydantic model, the answer it expects and (case, answer, fixed locally) for the ways model answers
+    actually break. Answers that can't be fixed without guessing must be re-asked."""
+    from pydantic import BaseModel
+
+    class Movie(BaseModel):
+        Dicrector : list[str] =Field(description="List of names of directors of the movie")
+        Actor : list[str]=Field(description="List of names of actors in the movie")
+        Producer : list[str]=Field(description="List of names of producers of the movie")
+        Year : int | None = Field(default=None, description="Release year")
+
+    expected = {"Dicrector": ["James Cameron"], "Actor": ["Leonardo DiCaprio", "Kate Winslet"], "Producer": ["Jon Landau"]}
+    corpus = [
+        ("valid", json.dumps(expected), True),
+        ("code fence", "```json\n" + json.dumps(expected, indent=2) + "\n```", True),
+        ("prose around", "Sure! Here is the JSON you asked for:\n" + json.dumps(expected) + "\nLet me know if you need more.", True),
+        ("braces in prose", "Sure, here is {the movie}: " + json.dumps(expected), True),
+        ("trailing commas", '{"Dicrector": ["James Cameron",], "Actor": ["Leonardo DiCaprio", "Kate Winslet",], "Producer": ["Jon Landau"],}', True),
+        ("single quotes", "{'Dicrector': ['James Cameron'], 'Actor': ['Leonardo DiCaprio', 'Kate Winslet'], 'Producer': ['Jon Landau']}", True),
+        ("python repr", "{'Dicrector': ['James Cameron'], 'Actor': ['Leonardo DiCaprio', 'Kate Winslet'], 'Producer': ['Jon Landau'], 'Year': None}", True),
+        ("unquoted keys", '{Dicrector: ["James Cameron"], Actor: ["Leonardo DiCaprio", "Kate Winslet"], Producer: ["Jon Landau"]}', True),
+        ("unquoted values", '{Dicrector: James Cameron, Actor: [Leonardo DiCaprio, Kate Winslet], Producer: Jon Landau}', True),
+        ("truncated", '{"Dicrector": ["James Cameron"], "Actor": ["Leonardo DiCaprio", "Kate Winslet"], "Producer": ["Jon Landau"', True),
+        ("truncated key", '{"Dicrector": ["James Cameron"], "Actor": ["Leonardo DiCaprio", "Kate Winslet"], "Producer": ["Jon Landau"], "Ye', False),
+        ("truncated literal", '{"Dicrector": ["James Cameron"], "Actor": ["Leonardo DiCaprio", "Kate Winslet"], "Producer": ["Jon Landau"], "Year": nu', False),
+        ("missing commas", '{"Dicrector": ["James Cameron"] "Actor": ["Leonardo DiCaprio" "Kate Winslet"] "Producer": ["Jon Landau"]}', True),
+        ("missing colon", '{"Dicrector" ["James Cameron"], "Actor": ["Leonardo DiCaprio", "Kate Winslet"], "Producer": ["Jon Landau"]}', False),
+        ("comments", '{\n  "Dicrector": ["James Cameron"], // from IMDb\n  "Actor": ["Leonardo DiCaprio", "Kate Winslet"],\n  "Producer": ["Jon Landau"]\n}', True),
+        ("lone strings", '{"Dicrector": "James Cameron", "Actor": ["Leonardo DiCaprio", "Kate Winslet"], "Producer": "Jon Landau"}', True),
+        ("key spelling", '{"dicrector": ["James Cameron"], "actor": ["Leonardo DiCaprio", "Kate Winslet"], "PRODUCER": ["Jon Landau"]}', True),
+        ("string year", '{"Dicrector": ["James Cameron"], "Actor": ["Leonardo DiCaprio", "Kate Winslet"], "Producer": ["Jon Landau"], "Year": "1997"}', True),
+        ("raw newline", '{"Dicrector": ["James Cameron"], "Actor": ["Leonardo DiCaprio", "Kate Winslet"], "Producer": ["Jon Landau"], "Plot": "A ship.\nIt sinks."}', True),
+        ("not json", "I'm sorry, I don't know that movie.", False),
+    ]
+    return Movie, expected, corpus
+
+def check_repair_corpus():
+    """Every corpus answer comes back as expected, repaired locally or through one re-ask as the corpus says,
+    and answers a repair could only guess at raise instead of returning wrong data."""
+    from langchain_core.language_models import FakeListChatModel
+    from langchain_core.output_parsers import JsonOutputParser, PydanticOutputParser
+
+    Movie, expected, corpus = _movie_corpus()
+    for case, answer, local in corpus:
+        reask_model = FakeListChatModel(responses=[json.dumps(expected)])
+        parser = RepairingOutputParser.from_llm(reask_model, PydanticOutputParser(pydantic_object=Movie))
+        movie = parser.parse(answer)
+        assert movie.model_dump(exclude={"Year"}) == expected, (case, movie)
+        assert parser.stats["reasked"] == (not local), (case, parser.stats)
+
+    assert repair_json('Sure, here is {the answer}: {"a": 1}')[0] == {"a": 1}
+    assert repair_json("{'text': 'don't'}")[0] == {"text": "don't"}
+    assert repair_json("{a: hello world}")[0] == {"a": "hello world"}
+    assert repair_json('{"a": {"b": [1, {"c": "unterminated')[0] == {"a": {"b": [1, {"c": "unterminated"}]}}
+    for answer in ('{"a": tru', '{"a": 1, "b": nul', '{"a": tru, "b": {"c": 1}}', '{"a" 1}', '{"a": 1,, "b": 2}',
+                   '{"a": 1}}, "b": 2}', "{{a}}", '{"a": 1, "b"}'):
+        try:
+            value = repair_json(answer)
+        except OutputParserException:
+            continue
+        raise AssertionError(f"{answer!r} was repaired to {value}, it should be re-asked")
+
+    json_parser = RepairingOutputParser(parser=JsonOutputParser())
+    assert json_parser.parse("```json\n{'a': [1, 2,], b: True}\n```") == {"a": [1, 2], "b": True}
+    try:
+        json_parser.parse('{"a": 1, "b": tr') # JsonOutputParser alone returns {"a": 1}
+        raise AssertionError("a truncated literal was accepted")
+    except OutputParserException:
+        pass
+    assert json_parser.stats == {"clean": 0, "repaired": 1, "reasked": 0, "failed": 1}, json_parser.stats
+
+if __name__ == "__main__":
+    from langchain_core.language_models import FakeListChatModel
+    from langchain_core.output_parsers import PydanticOutputParser
+    import argparse
+    import time
+
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--check", action="store_true", help="check the repair corpus and the lossy cases, then exit")
+    if arg_parser.parse_args().check:
+        check_repair_corpus()
+        print("repair corpus: ok")
+        raise SystemExit
+
+    Movie, expected, corpus = _movie_corpus()
+    # the re-ask model answers for the cases nothing local can fix without guessing
+    reask_model = FakeListChatModel(responses=[json.dumps(expected)])
+    parser = RepairingOutputParser.from_llm(reask_model, PydanticOutputParser(pydantic_object=Movie))
+    passed = 0
+    for case, answer, _ in corpus:
+        start = time.perf_counter()
+        try:
+            movie = parser.parse(answer)
+            ok = movie.model_dump(exclude={"Year"}) == expected
+        except OutputParserException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        repairs = parser.repair_log[-1][0] if parser.repair_log and parser.repair_log[-1][1] == answer else []
+        passed += ok
+        start = time.perf_counter()
+        try:
+            repair_json(answer)
+            local = "repaired"
+        except OutputParserException:
+            local = "re-asked"
+        repair_time = time.perf_counter() - start
+        print(f"{case:<17} {'ok ' if ok else 'FAIL'} parse {1e6 * elapsed:6.0f}us, repair_json {1e6 * repair_time:4.0f}us  "
+              f"{', '.join(sorted(set(repairs))) or '-' if local == 'repaired' else 're-asked'}")
+    print(f"{passed}/{len(corpus)} answers parsed, {parser.stats}")
@@ -1,9 +1,10 @@
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
-from langchain_core.output_parsers import PydanticOutputParser
 from langchain_core.prompts import PromptTemplate
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
 
+from chatmodels.model_registry import get_chat_model
+from output_parsers.compiled_pydantic_parser import get_pydantic_parser
+
 class Movie(BaseModel):
     Dicrector : list[str] =Field(description="List of names of directors of the movie")
     Actor : list[str]=Field(description="List of names of actors in the movie")
@@ -11,16 +12,12 @@ class Movie(BaseModel):
     
 load_dotenv()
 
-llm =  HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-4-Scout-17B-16E-Instruct",
-    task="text-generation"
-)
-model = ChatHuggingFace(llm=llm)
-parser = PydanticOutputParser(pydantic_object=Movie)
+model = get_chat_model("meta-llama/Llama-4-Scout-17B-16E-Instruct")
+parser = get_pydantic_parser(Movie) # validator and format instructions built once per schema
 template = PromptTemplate(
     template="Give me the names of the Directors, Actors and Producers of the Movie: {movie}\n{format_instruction}",
     input_variables=["movie"],
-    partial_variables={"format_instruction":parser.get_format_instructions}
+    partial_variables={"format_instruction":parser.get_format_instructions()}
 )
 chain = template|model|parser
 print(chain.invoke({"movie":"Titanic"}))
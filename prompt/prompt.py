@@ -1,4 +1,5 @@
 from langchain_core.prompts import PromptTemplate
+from prompt.template_registry import TemplateRegistry
 
 template = PromptTemplate(
     template="""
@@ -6,4 +7,5 @@ template = PromptTemplate(
     input_variables=["topic"],
     validate_template=True
 )
-template.save("template.json")
\ No newline at end of file
+version = TemplateRegistry(poll_interval=None).save("summary", template) # prompt_ui.py picks it up without a restart
+print(f"templates/summary/v{version}.json")
\ No newline at end of file
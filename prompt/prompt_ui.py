@@ -1,26 +1,70 @@
 import streamlit as st
-from langchain_huggingface import HuggingFaceEndpoint, ChatHuggingFace
 from dotenv import load_dotenv
-from langchain_core.prompts import load_prompt
+from collections import OrderedDict
+import threading
+import time
+
+started = time.perf_counter() # Streamlit runs this whole file again on every click
+from chatmodels.model_registry import get_chat_model
+from prompt.template_registry import TemplateRegistry
 
 load_dotenv()
 
-llm=HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-3.3-70B-Instruct",
-    task="text-generation",
-)
-model = ChatHuggingFace(llm=llm)
+@st.cache_resource
+def get_registry():
+    # templates/<name>/v<N>.json compiled once per server process, edited files are picked up on the next click
+    return TemplateRegistry()
+
+class AnswerCache:
+    """Finished answers per topic, least recently asked dropped first. Shared by all sessions of the app."""
+
+    def __init__(self, max_items=256):
+        self.max_items = max_items
+        self.answers = OrderedDict()
+        self._lock = threading.Lock() # Streamlit runs sessions on different threads
+
+    def get(self, topic):
+        with self._lock:
+            answer = self.answers.get(topic)
+            if answer is not None:
+                self.answers.move_to_end(topic)
+            return answer
+
+    def put(self, topic, answer):
+        with self._lock:
+            self.answers[topic] = answer
+            if len(self.answers) > self.max_items:
+                self.answers.popitem(last=False)
+
+@st.cache_resource
+def get_answer_cache():
+    return AnswerCache()
 
-template = load_prompt("template.json")
+template = get_registry().get("summary")
+chain = template | get_chat_model("meta-llama/Llama-3.3-70B-Instruct") # the model client is shared, built once
+answers = get_answer_cache()
+setup = time.perf_counter() - started
 
 st.header("Research Tool")
 
 user_input = st.text_input("Enter topic to get summary")
 
 
-if st.button("Send"):
-    chain = template | model
-    result = chain.invoke({
-    "topic":user_input
-    })
-    st.text(result.content)
\ No newline at end of file
+if st.button("Send") and user_input.strip():
+    topic = (template.template, " ".join(user_input.lower().split())) # "Black  Holes" and "black holes" share one answer
+    start = time.perf_counter()
+    answer = answers.get(topic)
+    if answer is not None:
+        st.text(answer)
+        st.caption(f"cached answer in {1000 * (time.perf_counter() - start):.1f}ms, setup {1000 * setup:.1f}ms")
+    else:
+        first_token = []
+        def tokens():
+            for chunk in chain.stream({"topic": user_input}):
+                if not first_token:
+                    first_token.append(time.perf_counter() - start)
+                yield chunk.content
+        answer = st.write_stream(tokens()) # tokens show up as they arrive instead of after the whole answer
+        answers.put(topic, answer)
+        st.caption(f"first token {1000 * first_token[0] if first_token else 0:.0f}ms, "
+                   f"full answer {1000 * (time.perf_counter() - start):.0f}ms, setup {1000 * setup:.1f}ms")
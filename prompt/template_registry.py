@@ -0,0 +1,226 @@
+from langchain_core.prompt_values import StringPromptValue
+from langchain_core.runnables import Runnable
+from string import Formatter
+import threading
+import logging
+import json
+import time
+import os
+import re
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+VERSION_FILE = re.compile(r"^v(\d+)\.json$")
+logger = logging.getLogger(__name__)
+
+class CompiledTemplate(Runnable):
+    """An f-string PromptTemplate parsed once into literal text and variable slots, partials already filled in.
+
+    `format` only joins strings, `invoke` wraps the result in the same StringPromptValue PromptTemplate returns
+    and is traced as a prompt run, so `compiled | model` works like `template | model`. Templates using format specs, conversions or attribute
+    access ("{x:>10}", "{x!r}", "{x.y}") are kept on str.format."""
+
+    def __init__(self, template, input_variables=None, partial_variables=None, name=None, version=None):
+        self.template = template
+        self.name = name
+        self.version = version
+        partials = {key: value() if callable(value) else value for key, value in (partial_variables or {}).items()}
+        self.partial_variables = partials
+        self._parts = [] # literal text and variable names, alternating: even index text, odd index variable
+        self._fallback = None
+        text = ""
+        for literal, field, spec, conversion in Formatter().parse(template):
+            text += literal
+            if field is None:
+                continue
+            if spec or conversion or not field.isidentifier():
+                self._fallback = template
+                break
+            if field in partials:
+                text += str(partials[field]) # precomputed once, e.g. a parser's format instructions
+            else:
+                self._parts.extend([text, field])
+                text = ""
+        self._parts.append(text)
+        self.input_variables = input_variables or sorted(set(self._parts[1::2]))
+
+    @classmethod
+    def from_prompt_template(cls, prompt_template, **kwargs):
+        if prompt_template.template_format != "f-string":
+            raise ValueError(f"only f-string templates can be compiled, got {prompt_template.template_format!r}")
+        return cls(prompt_template.template, prompt_template.input_variables, prompt_template.partial_variables, **kwargs)
+
+    def format(self, **kwargs):
+        if self._fallback is not None:
+            return self._fallback.format(**{**self.partial_variables, **kwargs})
+        parts = list(self._parts)
+        try:
+            for idx in range(1, len(parts), 2):
+                parts[idx] = str(kwargs[parts[idx]])
+        except KeyError as e:
+            raise KeyError(f"Input to {self.name or 'template'} is missing variable {e}. Expected: {self.input_variables}") from None
+        return "".join(parts)
+
+    def _to_dict(self, input):
+        # like PromptTemplate: a template with a single variable also takes the bare value
+        if isinstance(input, dict):
+            return input
+        if len(self.input_variables) == 1:
+            return {self.input_variables[0]: input}
+        raise TypeError(f"Expected mapping type as input to {self.name or 'template'}. Received {type(input)}.")
+
+    def _invoke(self, input):
+        return StringPromptValue(text=self.format(**self._to_dict(input)))
+
+    def invoke(self, input, config=None, **kwargs):
+        return self._call_with_config(self._invoke, input, config, run_type="prompt")
+
+    def __repr__(self):
+        return f"CompiledTemplate(name={self.name!r}, version={self.version!r}, input_variables={self.input_variables!r})"
+
+class TemplateRegistry:
+    """Versioned prompt templates from a directory, each parsed and compiled once.
+
+    Layout: `<directory>/<name>/v<N>.json`, files as written by `PromptTemplate.save`. `get(name)` returns the
+    highest version. Files are checked for changes at most every `poll_interval` seconds on access, a changed
+    file is recompiled and the next `get` returns the new template without restarting. A file that fails to
+    load (e.g. half written) keeps its previous template, the error is logged and kept in `errors`. `save`
+    writes a PromptTemplate as the next version."""
+
+    def __init__(self, directory=TEMPLATES_DIR, partials=None, poll_interval=1.0):
+        self.directory = directory
+        self.partials = partials or {} # shared partials, e.g. {"format_instruction": parser.get_format_instructions}
+        self.poll_interval = poll_interval # None: load once, never check again
+        self.templates = {} # name -> {version: CompiledTemplate}
+        self.stats = {"loads": 0, "reloads": 0, "errors": 0, "scans": 0}
+        self.errors = {} # path -> why the file was not loaded
+        self._mtimes = {} # path -> (mtime_ns, size)
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _compile(self, path, name, version):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("template_format", "f-string") != "f-string":
+            raise ValueError(f"{path}: only f-string templates can be compiled")
+        partials = {**self.partials, **data.get("partial_variables", {})}
+        input_variables = [var for var in data.get("input_variables", []) if var not in partials] or None
+        return CompiledTemplate(data["template"], input_variables, partials, name=name, version=version)
+
+    def reload(self):
+        """Compiles new and changed files, drops deleted ones. Returns the number of templates (re)loaded."""
+        with self._lock:
+            self.stats["scans"] += 1
+            seen, loaded = set(), 0
+            for name in os.listdir(self.directory) if os.path.isdir(self.directory) else []:
+                folder = os.path.join(self.directory, name)
+                if not os.path.isdir(folder):
+                    continue
+                for entry in os.scandir(folder):
+                    match = VERSION_FILE.match(entry.name)
+                    if not match:
+                        continue
+                    stat = entry.stat()
+                    seen.add(entry.path)
+                    if self._mtimes.get(entry.path) == (stat.st_mtime_ns, stat.st_size):
+                        continue
+                    version = int(match.group(1))
+                    try:
+                        compiled = self._compile(entry.path, name, version)
+                    except (OSError, ValueError, KeyError) as e:
+                        self.stats["errors"] += 1
+                        self.errors[entry.path] = e
+                        logger.warning("template %s not loaded: %r", entry.path, e)
+                        continue
+                    self.errors.pop(entry.path, None)
+                    self.stats["reloads" if entry.path in self._mtimes else "loads"] += 1
+                    self.templates.setdefault(name, {})[version] = compiled
+                    self._mtimes[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                    loaded += 1
+            for path in set(self.errors) - seen:
+                del self.errors[path]
+            for path in set(self._mtimes) - seen:
+                del self._mtimes[path]
+                name, version = os.path.basename(os.path.dirname(path)), int(VERSION_FILE.match(os.path.basename(path)).group(1))
+                self.templates.get(name, {}).pop(version, None)
+            self._checked = time.monotonic()
+        return loaded
+
+    def get(self, name, version=None):
+        if self.poll_interval is not None and time.monotonic() - self._checked >= self.poll_interval:
+            self.reload()
+        versions = self.templates.get(name)
+        if not versions:
+            failed = [f"{path}: {error!r}" for path, error in self.errors.items() if os.path.basename(os.path.dirname(path)) == name]
+            raise KeyError(f"no template named {name!r} in {self.directory}" + (f", not loaded: {'; '.join(failed)}" if failed else ""))
+        if version is None:
+            return versions[max(versions)]
+        if version not in versions:
+            raise KeyError(f"template {name!r} has no version {version}, available: {sorted(versions)}")
+        return versions[version]
+
+    def save(self, name, prompt_template):
+        """Writes `prompt_template` as the next version of `name` and returns its version. Saving the same
+        template text as the latest version again writes nothing and returns that version."""
+        folder = os.path.join(self.directory, name)
+        os.makedirs(folder, exist_ok=True)
+        with self._lock:
+            versions = [int(match.group(1)) for match in map(VERSION_FILE.match, os.listdir(folder)) if match]
+            if versions:
+                with open(os.path.join(folder, f"v{max(versions)}.json")) as f:
+                    if json.load(f).get("template") == prompt_template.template:
+                        return max(versions)
+            version = max(versions, default=0) + 1
+            partial = os.path.join(folder, f".v{version}.json") # not a version file until it is complete
+            prompt_template.save(partial)
+            os.replace(partial, os.path.join(folder, f"v{version}.json"))
+        self.reload()
+        return version
+
+    def names(self):
+        return {name: sorted(versions) for name, versions in self.templates.items() if versions}
+
+if __name__ == "__main__":
+    from langchain_core.output_parsers import JsonOutputParser
+    from langchain_core.prompts import PromptTemplate
+    import tempfile
+
+    parser = JsonOutputParser()
+    directory = tempfile.mkdtemp()
+    os.makedirs(os.path.join(directory, "movie"))
+    movie = PromptTemplate(
+        template="Give me the name of director, producer, actors of the given movie: \n{movie}\n{format_instruction}",
+        input_variables=["movie"],
+        partial_variables={"format_instruction": parser.get_format_instructions()}
+    )
+    def save(template, version):
+        # the fields PromptTemplate.save writes, partials are not saved, the registry supplies them
+        with open(os.path.join(directory, "movie", f"v{version}.json"), "w") as f:
+            json.dump({"input_variables": template.input_variables, "template": template.template, "template_format": "f-string", "_type": "prompt"}, f)
+
+    save(movie, 1)
+
+    registry = TemplateRegistry(directory, partials={"format_instruction": parser.get_format_instructions})
+    compiled = registry.get("movie")
+    assert compiled.invoke({"movie": "Titanic"}) == movie.invoke({"movie": "Titanic"})
+
+    runs = 20_000
+    for label, call in [
+        ("PromptTemplate.invoke", lambda: movie.invoke({"movie": "Titanic"})),
+        ("CompiledTemplate.invoke", lambda: compiled.invoke({"movie": "Titanic"})),
+        ("CompiledTemplate.format", lambda: compiled.format(movie="Titanic")),
+        ("registry.get + format", lambda: registry.get("movie").format(movie="Titanic")), # files checked once a second
+    ]:
+        start = time.perf_counter()
+        for _ in range(runs):
+            call()
+        elapsed = time.perf_counter() - start
+        print(f"{label:<24} {runs / elapsed:>10,.0f} formats/s  {1e6 * elapsed / runs:6.2f}us each")
+
+    # hot reload: a new version and an edited one are picked up on the next get
+    registry.poll_interval = 0.0
+    save(PromptTemplate.from_template("Name only the director of {movie}.\n{format_instruction}"), 2)
+    print(registry.get("movie"), "->", registry.get("movie").format(movie="Titanic").splitlines()[0])
+    save(PromptTemplate.from_template("Name only the director of the movie {movie}.\n{format_instruction}"), 2)
+    print(registry.get("movie"), "->", registry.get("movie").format(movie="Titanic").splitlines()[0])
+    print(registry.names(), registry.stats)
@@ -0,0 +1,308 @@
+from langchain_core.runnables import Runnable, RunnableSequence, RunnableParallel, RunnableBranch, RunnablePassthrough
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.output_parsers import StrOutputParser, BaseOutputParser
+from langchain_core.prompts import PromptTemplate, BasePromptTemplate
+from langchain_core.load import dumps
+from concurrent.futures import Future
+from contextvars import ContextVar
+from collections import Counter
+import threading
+import asyncio
+
+# memo of the invocation currently running, shared (not copied) with the threads RunnableParallel starts
+_invocation_memo = ContextVar("invocation_memo", default=None)
+
+class SharedRunnable(Runnable):
+    # wraps a sub-chain that appears more than once in the graph, runs it once per distinct input per invocation.
+    # invoke, ainvoke, stream and astream all go through the memo: the first caller runs the sub-chain natively
+    # (streaming its chunks), the others wait for its result
+
+    def __init__(self, bound):
+        self.bound = bound
+        self.name = f"Shared[{bound.get_name()}]"
+
+    def get_input_schema(self, config=None):
+        return self.bound.get_input_schema(config)
+
+    def get_output_schema(self, config=None):
+        return self.bound.get_output_schema(config)
+
+    def _claim(self, input):
+        # (future, owner): the owner computes the result and sets the future, the others read it.
+        # Outside an eliminator invocation there is nothing to share, (None, True)
+        memo = _invocation_memo.get()
+        if memo is None:
+            return None, True
+        try:
+            input_key = dumps(input)
+        except Exception:
+            input_key = repr(input)
+        key = (id(self.bound), input_key)
+
+        lock, futures = memo
+        with lock:
+            future = futures.get(key)
+            owner = future is None
+            if owner:
+                future = futures[key] = Future()
+        return future, owner
+
+    @staticmethod
+    def _settle(future, result=None, error=None):
+        if future is None or future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def invoke(self, input, config=None, **kwargs):
+        future, owner = self._claim(input)
+        if not owner:
+            return future.result() # another branch is already computing the same thing, wait for it
+        try:
+            result = self.bound.invoke(input, config, **kwargs)
+        except Exception as e:
+            self._settle(future, error=e)
+            raise
+        self._settle(future, result)
+        return result
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        future, owner = self._claim(input)
+        if not owner:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await self.bound.ainvoke(input, config, **kwargs)
+        except BaseException as e:
+            self._settle(future, error=e if isinstance(e, Exception) else RuntimeError("shared run was cancelled"))
+            raise
+        self._settle(future, result)
+        return result
+
+    def stream(self, input, config=None, **kwargs):
+        future, owner = self._claim(input)
+        if not owner:
+            yield future.result()
+            return
+        final = None
+        try:
+            for chunk in self.bound.stream(input, config, **kwargs):
+                yield chunk
+                final = chunk if final is None else final + chunk
+        except BaseException as e:
+            self._settle(future, error=e if isinstance(e, Exception) else RuntimeError("shared stream was closed early"))
+            raise
+        self._settle(future, final)
+
+    async def astream(self, input, config=None, **kwargs):
+        future, owner = self._claim(input)
+        if not owner:
+            yield await asyncio.wrap_future(future)
+            return
+        final = None
+        try:
+            async for chunk in self.bound.astream(input, config, **kwargs):
+                yield chunk
+                final = chunk if final is None else final + chunk
+        except BaseException as e:
+            self._settle(future, error=e if isinstance(e, Exception) else RuntimeError("shared stream was closed early"))
+            raise
+        self._settle(future, final)
+
+class CommonSubchainEliminator(Runnable):
+    # entry point of the optimized graph, opens a fresh memo for every invocation (batch runs invoke per input)
+
+    def __init__(self, bound):
+        self.bound = bound
+        self.name = bound.get_name()
+
+    def get_input_schema(self, config=None):
+        return self.bound.get_input_schema(config)
+
+    def get_output_schema(self, config=None):
+        return self.bound.get_output_schema(config)
+
+    def get_graph(self, config=None):
+        return self.bound.get_graph(config)
+
+    def invoke(self, input, config=None, **kwargs):
+        token = _invocation_memo.set((threading.Lock(), {}))
+        try:
+            return self.bound.invoke(input, config, **kwargs)
+        finally:
+            _invocation_memo.reset(token)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        token = _invocation_memo.set((threading.Lock(), {}))
+        try:
+            return await self.bound.ainvoke(input, config, **kwargs)
+        finally:
+            _invocation_memo.reset(token)
+
+    def stream(self, input, config=None, **kwargs):
+        # a generator may be resumed from another context, the memo is set around each step instead of once
+        memo = (threading.Lock(), {})
+        chunks = self.bound.stream(input, config, **kwargs)
+        while True:
+            token = _invocation_memo.set(memo)
+            try:
+                chunk = next(chunks, _DONE)
+            finally:
+                _invocation_memo.reset(token)
+            if chunk is _DONE:
+                return
+            yield chunk
+
+    async def astream(self, input, config=None, **kwargs):
+        memo = (threading.Lock(), {})
+        chunks = self.bound.astream(input, config, **kwargs).__aiter__()
+        while True:
+            token = _invocation_memo.set(memo)
+            try:
+                chunk = await anext(chunks, _DONE)
+            finally:
+                _invocation_memo.reset(token)
+            if chunk is _DONE:
+                return
+            yield chunk
+
+_DONE = object()
+
+def _children(runnable):
+    if isinstance(runnable, RunnableSequence):
+        return runnable.steps
+    if isinstance(runnable, RunnableParallel):
+        return list(runnable.steps__.values())
+    if isinstance(runnable, RunnableBranch):
+        return [r for branch in runnable.branches for r in branch] + [runnable.default]
+    return []
+
+def _sequence(steps):
+    if not steps:
+        return RunnablePassthrough()
+    return steps[0] if len(steps) == 1 else RunnableSequence(*steps)
+
+def _hoist(runnable):
+    # nested sequences are flattened by RunnableSequence, so a sub-chain shared by every branch of a
+    # RunnableParallel shows up as a common prefix of the branches: run it once, before the fan-out
+    if isinstance(runnable, RunnableSequence):
+        return RunnableSequence(*[_hoist(step) for step in runnable.steps], name=runnable.name)
+    if isinstance(runnable, RunnableBranch):
+        return RunnableBranch(
+            *[(_hoist(condition), _hoist(branch)) for condition, branch in runnable.branches],
+            _hoist(runnable.default)
+        )
+    if not isinstance(runnable, RunnableParallel):
+        return runnable
+
+    branches = {key: _hoist(step) for key, step in runnable.steps__.items()}
+    steps = {key: step.steps if isinstance(step, RunnableSequence) else [step] for key, step in branches.items()}
+    prefix = []
+    if len(steps) > 1:
+        for column in zip(*steps.values()):
+            if any(step is not column[0] for step in column):
+                break
+            prefix.append(column[0])
+    if not prefix:
+        return RunnableParallel(branches)
+    return RunnableSequence(
+        *prefix,
+        RunnableParallel({key: _sequence(step[len(prefix):]) for key, step in steps.items()})
+    )
+
+def _count(runnable, counts):
+    counts[id(runnable)] += 1
+    if counts[id(runnable)] == 1: # a repeated sub-chain is shared as a whole, its insides are counted once
+        for child in _children(runnable):
+            _count(child, counts)
+
+def _rewrite(runnable, counts, shared):
+    # prompts and parsers are cheaper to re-run than to key on their input
+    worth_sharing = not isinstance(runnable, (BasePromptTemplate, BaseOutputParser, RunnablePassthrough))
+    if counts[id(runnable)] > 1 and worth_sharing:
+        if id(runnable) not in shared:
+            shared[id(runnable)] = SharedRunnable(_rewrite_children(runnable, counts, shared))
+        return shared[id(runnable)]
+    return _rewrite_children(runnable, counts, shared)
+
+def _rewrite_children(runnable, counts, shared):
+    if isinstance(runnable, RunnableSequence):
+        return RunnableSequence(*[_rewrite(step, counts, shared) for step in runnable.steps], name=runnable.name)
+    if isinstance(runnable, RunnableParallel):
+        return RunnableParallel({key: _rewrite(step, counts, shared) for key, step in runnable.steps__.items()})
+    if isinstance(runnable, RunnableBranch):
+        return RunnableBranch(
+            *[(_rewrite(condition, counts, shared), _rewrite(branch, counts, shared)) for condition, branch in runnable.branches],
+            _rewrite(runnable.default, counts, shared)
+        )
+    return runnable
+
+def eliminate_common_subchains(chain):
+    """Opt-in optimizer pass. A sub-chain that starts every branch of a RunnableParallel is hoisted
+    in front of it, and any other sub-runnable used more than once is executed once per distinct
+    input within a single invocation, its result being shared."""
+    chain = _hoist(chain)
+    counts = Counter()
+    _count(chain, counts)
+    return CommonSubchainEliminator(_rewrite(chain, counts, {}))
+
+#---------------------------------- Demo: model calls before and after ----------------------------------
+
+class ModelCallCounter(BaseCallbackHandler):
+    def __init__(self):
+        self.calls = 0
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.calls += 1
+
+model = FakeListChatModel(responses=["A detailed research report on the topic"])
+string_parser = StrOutputParser()
+
+template_research = PromptTemplate(
+    template="You are an research agent, return all the information you have on the topic: {topic}",
+    input_variables=["topic"]
+)
+template_summary = PromptTemplate(
+    template="Write a 5 line summary of the text\n{text}",
+    input_variables=["text"]
+)
+template_keywords = PromptTemplate(
+    template="Extract the keywords from the text\n{text}",
+    input_variables=["text"]
+)
+
+research_chain = RunnableSequence(template_research, model, string_parser)
+final_chain = RunnableParallel({
+    "summary": RunnableSequence(research_chain, template_summary, model, string_parser),
+    "keywords": RunnableSequence(research_chain, template_keywords, model, string_parser)
+})
+optimized_chain = eliminate_common_subchains(final_chain)
+
+calls = {}
+for name, chain in [("original", final_chain), ("optimized", optimized_chain)]:
+    counter = ModelCallCounter()
+    result = chain.invoke({"topic": "Engineer"}, config={"callbacks": [counter]})
+    calls[name] = counter.calls
+    print(f"{name}: {counter.calls} model calls")
+
+# research, summary and keywords: the research call is shared by both branches after the elimination
+assert calls == {"original": 4, "optimized": 3}, calls
+expected = final_chain.invoke({"topic": "Engineer"})
+assert optimized_chain.invoke({"topic": "Engineer"}) == expected
+
+counter = ModelCallCounter()
+assert asyncio.run(optimized_chain.ainvoke({"topic": "Engineer"}, config={"callbacks": [counter]})) == expected
+assert counter.calls == 3, counter.calls
+
+counter = ModelCallCounter()
+chunks = list(optimized_chain.stream({"topic": "Engineer"}, config={"callbacks": [counter]}))
+streamed = {}
+for chunk in chunks:
+    for key, text in chunk.items():
+        streamed[key] = streamed.get(key, "") + text
+assert streamed == expected and len(chunks) > len(expected), len(chunks) # streamed token by token, not one invoke
+assert counter.calls == 3, counter.calls
+print(f"ainvoke: 3 model calls, stream: 3 model calls in {len(chunks)} chunks")
+optimized_chain.get_graph().print_ascii()
@@ -1,21 +1,17 @@
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnableSequence, RunnableParallel, RunnablePassthrough, RunnableLambda
 from langchain_core.prompts import PromptTemplate
 from dotenv import load_dotenv
 
+from chatmodels.model_registry import get_chat_model
+
 load_dotenv()
 
 def code_creator(text):
     with open("demo_code.py","w") as code_file:
         code_file.write(text)
         
-llm = HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-4-Scout-17B-16E-Instruct",
-    task="text-generation"
-)
-
-model = ChatHuggingFace(llm=llm)
+model = get_chat_model("meta-llama/Llama-4-Scout-17B-16E-Instruct")
 string_parser = StrOutputParser()
 
 template_code = PromptTemplate(
@@ -1,17 +1,13 @@
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
 from langchain_core.runnables import RunnableSequence, RunnableParallel, RunnablePassthrough
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
 
-load_dotenv()
+from chatmodels.model_registry import get_chat_model
 
-llm = HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-4-Scout-17B-16E-Instruct",
-    task="text-generation"
-)
+load_dotenv()
 
-model = ChatHuggingFace(llm=llm)
+model = get_chat_model("meta-llama/Llama-4-Scout-17B-16E-Instruct")
 string_parser = StrOutputParser()
 template_code= PromptTemplate(
     template="Give me the code for the following\n{task}",
@@ -24,7 +20,7 @@ template_explain=PromptTemplate(
 code_generation_chain=RunnableSequence(template_code,model,string_parser)
 parallel_chain=RunnableParallel({
     "code": RunnablePassthrough(),
-    "explain": RunnableSequence(code_generation_chain,template_explain,model,string_parser)
+    "explain": RunnableSequence(template_explain,model,string_parser) # explains the code generated above instead of generating it again
 })
 final_chain = RunnableSequence(code_generation_chain,parallel_chain)
 result = final_chain.invoke({"task":"Generate GCD of two numbers"})
@@ -1,16 +1,14 @@
 from langchain_core.runnables import RunnableSequence
 from langchain_core.prompts import PromptTemplate
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
 from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
 
+from chatmodels.llm_cache import SQLiteLLMCache
+from chatmodels.model_registry import get_chat_model
+
 load_dotenv()
 
-llm = HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-4-Scout-17B-16E-Instruct",
-    task="text-generation"
-)
-model =ChatHuggingFace(llm=llm)
+model = get_chat_model("meta-llama/Llama-4-Scout-17B-16E-Instruct", cache=SQLiteLLMCache())
 string_parser=StrOutputParser()
 template_code = PromptTemplate(
     template="Give me the code for the following\n{task}",
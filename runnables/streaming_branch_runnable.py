@@ -0,0 +1,143 @@
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable, RunnableSequence, RunnablePassthrough
+from langchain_core.runnables.base import coerce_to_runnable
+from langchain_core.runnables.config import patch_config
+from langchain_core.prompts import PromptTemplate
+from dotenv import load_dotenv
+import time
+
+from chatmodels.model_registry import get_chat_model
+
+load_dotenv()
+
+class TextSoFar:
+    """What a predicate sees. `new` is the latest chunk ("" on the last call at the end of the stream),
+    `text` joins the chunks on first use, `state` is a per-stream dict for running totals, so a predicate
+    can look at each chunk once instead of rescanning the whole text on every token."""
+
+    def __init__(self):
+        self.chunks = []
+        self.new = ""
+        self.state = {}
+        self._text = None
+
+    def append(self, chunk):
+        self.chunks.append(chunk)
+        self.new = chunk
+        self._text = None
+
+    def finish(self):
+        self.new = ""
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = "".join(self.chunks)
+        return self._text
+
+class StreamingBranch(Runnable):
+    """RunnableBranch for text streams. Each predicate is called with (text_so_far, finished), text_so_far
+    being a TextSoFar, and returns True (take this branch), False (this branch can no longer match) or None
+    (undecided yet). Every predicate still in the running sees every chunk.
+    The first branch that matches gets the chunks seen so far plus the rest of the stream through its
+    `transform`, so it starts as soon as the decision is made instead of after the whole input arrived."""
+
+    def __init__(self, *branches, default=None):
+        self.branches = [(predicate, coerce_to_runnable(runnable)) for predicate, runnable in branches]
+        self.default = coerce_to_runnable(default) if default is not None else RunnablePassthrough()
+
+    def _decide(self, seen, finished, ruled_out):
+        decisions = {}
+        for idx, (predicate, _) in enumerate(self.branches):
+            if idx in ruled_out:
+                continue
+            decision = predicate(seen, finished)
+            if decision is False or (decision is None and finished):
+                ruled_out.add(idx)
+            else:
+                decisions[idx] = decision
+        for idx, (_, runnable) in enumerate(self.branches):
+            if idx not in ruled_out:
+                # an earlier branch that is still undecided goes first, a later match can't be taken yet
+                return runnable if decisions[idx] else None
+        return self.default
+
+    def _invoke(self, input, run_manager, config):
+        seen = TextSoFar()
+        seen.append(input)
+        chosen = self._decide(seen, True, set())
+        return chosen.invoke(input, patch_config(config, callbacks=run_manager.get_child()))
+
+    def invoke(self, input, config=None, **kwargs):
+        return self._call_with_config(self._invoke, input, config, **kwargs)
+
+    def _transform(self, chunks, run_manager, config):
+        seen = TextSoFar()
+        ruled_out = set()
+        chosen = None
+        for chunk in chunks:
+            seen.append(chunk)
+            chosen = self._decide(seen, False, ruled_out)
+            if chosen is not None:
+                break
+        if chosen is None:
+            seen.finish()
+            chosen = self._decide(seen, True, ruled_out)
+
+        def replay():
+            yield from seen.chunks
+            yield from chunks
+
+        yield from chosen.transform(replay(), patch_config(config, callbacks=run_manager.get_child()))
+
+    def transform(self, input, config=None, **kwargs):
+        yield from self._transform_stream_with_config(input, self._transform, config, **kwargs)
+
+    def stream(self, input, config=None, **kwargs):
+        yield from self.transform(iter([input]), config, **kwargs)
+
+def word_count_exceeds(limit):
+    def predicate(seen, finished):
+        # running count over the new chunk only, a word split across two chunks is counted once
+        count, in_word = seen.state.get(predicate, (0, False))
+        new = seen.new
+        if new:
+            words = len(new.split())
+            if words and in_word and not new[0].isspace():
+                words -= 1
+            count, in_word = count + words, not new[-1].isspace()
+            seen.state[predicate] = (count, in_word)
+        if count > limit:
+            return True
+        return False if finished else None
+    return predicate
+
+model = get_chat_model("meta-llama/Llama-4-Scout-17B-16E-Instruct")
+string_parser = StrOutputParser()
+
+template_text_generator = PromptTemplate(
+    template="Write a detailed report on the topic:{topic}",
+    input_variables=["topic"]
+)
+template_summarizer = PromptTemplate(
+    template="Write a summary on text:{text}",
+    input_variables=["text"]
+)
+
+text_generator = RunnableSequence(template_text_generator,model,string_parser)
+
+branch_chain = StreamingBranch(
+    (word_count_exceeds(500), RunnableSequence(template_summarizer,model,string_parser)),
+    default=RunnablePassthrough()
+)
+
+final_chain = RunnableSequence(text_generator,branch_chain)
+
+start = time.perf_counter()
+first_token = None
+for chunk in final_chain.stream({"topic":"Engineer"}):
+    if first_token is None:
+        first_token = time.perf_counter() - start
+    print(chunk, end="", flush=True)
+print(f"\n\nfirst token after {first_token:.2f}s, total {time.perf_counter() - start:.2f}s")
+final_chain.get_graph().print_ascii()
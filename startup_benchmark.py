@@ -0,0 +1,136 @@
+import subprocess
+import argparse
+import json
+import ast
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(ROOT, "startup_baseline.json")
+# imported in a fresh interpreter next to the entry points: the baseline stores times relative to it,
+# so a baseline written on one machine still gates runs on a slower or faster one
+REFERENCE_CODE = "from langchain_core.prompts import PromptTemplate; from langchain_core.output_parsers import StrOutputParser"
+SKIP_DIRS = {"__pycache__", ".git", ".venv", "venv"}
+SKIP_FILES = {"startup_benchmark.py", "demo_code.py", "tempCodeRunnerFile.py"}
+# module level calls that load settings or build model clients, they run at startup next to the imports
+STARTUP_CALLS = {"load_dotenv", "configure_http_pool", "get_chat_model", "get_embeddings", "get_endpoint",
+                 "ChatHuggingFace", "HuggingFaceEndpoint", "HuggingFaceEndpointEmbeddings",
+                 "ChatGoogleGenerativeAI", "GoogleGenerativeAIEmbeddings"}
+
+def entry_points():
+    for folder, dirs, files in os.walk(ROOT):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS and not d.startswith("."))
+        if folder == ROOT:
+            continue
+        for name in sorted(files):
+            if name.endswith(".py") and name not in SKIP_FILES:
+                yield os.path.relpath(os.path.join(folder, name), ROOT)
+
+def _startup_call(node):
+    value = node.value if isinstance(node, (ast.Assign, ast.AnnAssign, ast.Expr)) else None
+    if not isinstance(value, ast.Call):
+        return False
+    name = value.func.id if isinstance(value.func, ast.Name) else getattr(value.func, "attr", None)
+    return name in STARTUP_CALLS
+
+def startup_code(path):
+    """What a script does before its own code runs: its top level imports and the module level calls that
+    build model clients (`model = get_chat_model(...)`, which imports langchain_huggingface), in file order.
+    Nothing else is executed, so no model is called and no input() waits."""
+    with open(os.path.join(ROOT, path)) as f:
+        tree = ast.parse(f.read())
+    keep = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)) or _startup_call(node)]
+    return "\n".join(ast.unparse(node) for node in keep)
+
+def measure(path=None):
+    """Cold start of one entry point (the reference imports without one) in a fresh interpreter: the wall time
+    of its startup code, and its heaviest imports from `-X importtime`."""
+    code = REFERENCE_CODE if path is None else startup_code(path)
+    timed = f"import time as _clock\n_started = _clock.perf_counter()\n{code}\nprint(1000 * (_clock.perf_counter() - _started))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", timed],
+        cwd=ROOT, capture_output=True, text=True # scripts run as modules from the repo root
+    )
+    if result.returncode != 0:
+        missing = [line for line in result.stderr.splitlines() if "ModuleNotFoundError" in line]
+        return {"error": missing[-1].split(": ", 1)[1] if missing else result.stderr.strip().splitlines()[-1]}
+
+    top_level = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "): # imported by the script itself, not by another module
+            top_level[name.strip()] = int(cumulative) / 1000
+    heaviest = sorted(top_level.items(), key=lambda item: -item[1])[:3]
+    startup_ms = float(result.stdout.strip().splitlines()[-1])
+    return {"startup_ms": round(startup_ms, 1), "heaviest": {name: round(ms, 1) for name, ms in heaviest}}
+
+def fastest_run(path, runs):
+    # load on the machine only ever adds time, the fastest of several fresh interpreters is the stable estimate
+    results = [measure(path) for _ in range(runs)]
+    if "error" in results[0]:
+        return results[0]
+    return min(results, key=lambda result: result["startup_ms"])
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Import time per entry point, fails when one regresses against the baseline")
+    arg_parser.add_argument("paths", nargs="*", help="entry points relative to the repo root (default: all)")
+    arg_parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per entry point, the fastest counts")
+    arg_parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    arg_parser.add_argument("--slack-ms", type=float, default=30.0, help="allowed absolute slowdown, absorbs noise on fast scripts")
+    arg_parser.add_argument("--update", action="store_true", help="write the measured times as the new baseline")
+    args = arg_parser.parse_args()
+
+    baseline = {"reference_ms": None, "relative": {}}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+    measure() # warms the file cache, the first cold start is always an outlier
+    reference = fastest_run(None, max(args.runs, 5))["startup_ms"]
+    print(f"{'reference imports':<70} {reference:>8.1f}ms")
+
+    def limit(path, reference):
+        # the baseline scaled to this machine, plus the allowed slowdown
+        before = baseline["relative"][path] * reference
+        return before, before * (1 + args.tolerance) + args.slack_ms
+
+    regressions = []
+    measured = {}
+    for path in args.paths or entry_points():
+        result = fastest_run(path, args.runs)
+        if "error" in result:
+            print(f"{path:<70} skipped ({result['error']})")
+            continue
+        status = "new"
+        if path in baseline["relative"]:
+            before, allowed = limit(path, reference)
+            status = f"baseline {before:.0f}ms"
+            if result["startup_ms"] > allowed and not args.update:
+                # confirm before failing: a fresh reference (the machine may have slowed down) and more runs
+                recheck = fastest_run(None, max(args.runs, 5))["startup_ms"]
+                result = min(result, fastest_run(path, 2 * args.runs), key=lambda result: result["startup_ms"])
+                before, allowed = limit(path, recheck)
+                status = f"baseline {before:.0f}ms"
+                if result["startup_ms"] > allowed:
+                    status = f"REGRESSED from {before:.0f}ms"
+                    regressions.append(path)
+        measured[path] = round(result["startup_ms"] / reference, 3)
+        heaviest = ", ".join(f"{name} {ms:.0f}ms" for name, ms in result["heaviest"].items())
+        print(f"{path:<70} {result['startup_ms']:>8.1f}ms  {status:<28} {heaviest}")
+
+    if args.update:
+        baseline["reference_ms"] = reference # informational, comparisons only use the relative times
+        baseline["relative"] = dict(sorted({**baseline["relative"], **measured}.items()))
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {BASELINE_PATH}")
+        return 0
+    if regressions:
+        print(f"{len(regressions)} entry point(s) start slower than the baseline: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
+from structured_output.schema_cache import get_structured_model
 
 load_dotenv()
 
@@ -47,7 +48,7 @@ model = ChatGoogleGenerativeAI(
     model="gemini-2.5-flash-lite"
 )
 
-structuerd_model = model.with_structured_output(json)
+structuerd_model = get_structured_model(model, json) # schema converted once, shared by every call
 
 print(structuerd_model.invoke("""The CVR College of Engineering was established in 2000. It is approved by the All India Council for Technical Education and accredited by the National Board of Accreditation, India.
                               
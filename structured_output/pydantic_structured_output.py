@@ -1,6 +1,7 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
 from typing import TypedDict, Annotated, Optional, Literal
 from dotenv import load_dotenv
+from structured_output.schema_cache import get_structured_model
 from pydantic import BaseModel, Field, EmailStr
 
 load_dotenv()
@@ -17,7 +18,7 @@ model = ChatGoogleGenerativeAI(
     model="gemini-2.5-flash-lite"
 )
 
-structuerd_model = model.with_structured_output(college_details)
+structuerd_model = get_structured_model(model, college_details) # schema converted once, shared by every call
 
 print(structuerd_model.invoke("""The CVR College of Engineering was established in 2000. It is approved by the All India Council for Technical Education and accredited by the National Board of Accreditation, India.
                               
@@ -0,0 +1,145 @@
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langchain_core.runnables import RunnableBinding, RunnableSequence
+from pydantic import BaseModel, PydanticUserError, TypeAdapter
+import threading
+import json
+
+_cache = {} # (kind, schema key, ...) -> value
+_lock = threading.RLock() # builds nest: get_structured_model needs tool_schema
+
+def _schema_key(schema):
+    # classes are keyed by themselves, dict schemas by identity (the dict is kept alive in the cache entry,
+    # so its id is never reused), treat cached dict schemas as read only
+    return schema if isinstance(schema, type) else ("id", id(schema))
+
+def _cached(key, build):
+    value = _cache.get(key)
+    if value is None:
+        with _lock:
+            value = _cache.get(key)
+            if value is None:
+                value = _cache[key] = build()
+    return value
+
+def tool_schema(schema):
+    """convert_to_openai_tool(schema) computed once per schema, for a Pydantic model, TypedDict or JSON schema."""
+    return _cached(("tool", _schema_key(schema)), lambda: (convert_to_openai_tool(schema), schema))[0]
+
+def tool_schema_json(schema):
+    """The tool schema serialized once, for request bodies and cache keys."""
+    return _cached(("tool_json", _schema_key(schema)), lambda: (json.dumps(tool_schema(schema), sort_keys=True), schema))[0]
+
+def validator(schema):
+    """Function turning the tool call arguments into the structured output: a model instance for Pydantic,
+    a validated dict for TypedDict, the arguments as they are for a JSON schema (nothing checks them)."""
+    def build():
+        if isinstance(schema, type) and issubclass(schema, BaseModel):
+            return schema.model_validate, schema
+        if isinstance(schema, type):
+            try:
+                return TypeAdapter(schema).validate_python, schema
+            except PydanticUserError:
+                pass # typing.TypedDict before Python 3.12, pydantic needs typing_extensions.TypedDict there
+        return (lambda args: args), schema
+    return _cached(("validator", _schema_key(schema)), build)[0]
+
+def _precomputed_trace_schema(structured, schema):
+    # with_structured_output binds ls_structured_output_format={"schema": schema} and every invoke converts
+    # that schema to JSON schema again for tracing. The cached tool dict converts to the same JSON schema
+    # in microseconds instead of milliseconds.
+    if not isinstance(structured, RunnableSequence) or not isinstance(structured.first, RunnableBinding):
+        return structured
+    binding = structured.first
+    trace_format = binding.kwargs.get("ls_structured_output_format")
+    if not trace_format or trace_format.get("schema") is not schema:
+        return structured
+    binding = binding.bind(ls_structured_output_format={**trace_format, "schema": tool_schema(schema)})
+    return RunnableSequence(binding, *structured.middle, structured.last)
+
+def get_structured_model(model, schema, **kwargs):
+    """`model.with_structured_output(schema, **kwargs)` built once per model, schema and arguments and shared
+    afterwards. Use it with models from chatmodels/model_registry.py, those are shared instances too."""
+    key = ("structured", id(model), _schema_key(schema), tuple(sorted(kwargs.items())))
+    build = lambda: (_precomputed_trace_schema(model.with_structured_output(schema, **kwargs), schema), model, schema)
+    return _cached(key, build)[0]
+
+def clear():
+    with _lock:
+        _cache.clear()
+
+if __name__ == "__main__":
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+    import ast
+    import os
+    import time
+
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    def load_definition(script, name):
+        # the schema of a script without running it (the scripts call Gemini at import): only its typing and
+        # pydantic imports and the definition of `name` are executed
+        with open(os.path.join(here, script)) as f:
+            tree = ast.parse(f.read())
+        keep = [node for node in tree.body if isinstance(node, ast.ImportFrom) and node.module in ("typing", "pydantic")]
+        keep += [node for node in tree.body if isinstance(node, ast.ClassDef) and node.name == name
+                 or isinstance(node, ast.Assign) and any(getattr(t, "id", None) == name for t in node.targets)]
+        namespace = {}
+        exec(compile(ast.Module(body=keep, type_ignores=[]), script, "exec"), namespace)
+        return namespace[name]
+
+    flavours = {
+        "JSON schema": load_definition("json_structured_output.py", "json"),
+        "TypedDict": load_definition("typedict.py", "college_details"),
+        "Pydantic": load_definition("pydantic_structured_output.py", "college_details"),
+    }
+    answer = {"college_name": "CVR College of Engineering", "college_established_year": 2000,
+              "college_location": "Mangalpally, 20 km from the center of Hyderabad",
+              "courses_offered": ["Civil", "CSE", "ECE", "EEE", "IT", "Mechanical"],
+              "minor_courses": ["AI & ML", "Cyber Security", "Data Science", "IoT"], "country": "India"}
+
+    class FakeToolCallingModel(BaseChatModel):
+        # local stand-in for the endpoint: converts tools like a provider and answers with one tool call at once
+        @property
+        def _llm_type(self):
+            return "fake-tool-calling"
+
+        def bind_tools(self, tools, tool_choice=None, **kwargs):
+            return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], tool_choice=tool_choice, **kwargs)
+
+        def _generate(self, messages, stop=None, run_manager=None, tools=(), **kwargs):
+            name = tools[0]["function"]["name"]
+            message = AIMessage(content="", tool_calls=[{"name": name, "args": answer, "id": "call_1", "type": "tool_call"}])
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+    model = FakeToolCallingModel()
+
+    def per_call(call, runs):
+        start = time.perf_counter()
+        for _ in range(runs):
+            call()
+        return 1e6 * (time.perf_counter() - start) / runs
+
+    rows = []
+    for flavour, schema in flavours.items():
+        validate = validator(schema)
+        cached = get_structured_model(model, schema)
+        plain = model.with_structured_output(schema)
+        assert cached.invoke("CVR College") == plain.invoke("CVR College")
+        rows.append((flavour, [
+            per_call(lambda: convert_to_openai_tool(schema), 200),
+            per_call(lambda: tool_schema(schema), 20_000),
+            per_call(lambda: model.with_structured_output(schema), 100),
+            per_call(lambda: get_structured_model(model, schema), 20_000),
+            per_call(lambda: json.dumps(convert_to_openai_tool(schema)), 200),
+            per_call(lambda: tool_schema_json(schema), 20_000),
+            per_call(lambda: validate(answer), 20_000),
+            per_call(lambda: plain.invoke("CVR College"), 200),
+            per_call(lambda: cached.invoke("CVR College"), 200),
+        ]))
+    columns = ["convert", "cached", "with_structured_output", "cached", "serialize tool", "cached", "validate",
+               "invoke", "cached invoke"]
+    print(f"{'microseconds':<12}" + "".join(f"{column:>{max(len(column), 8) + 2}}" for column in columns))
+    for flavour, values in rows:
+        print(f"{flavour:<12}" + "".join(f"{value:>{max(len(column), 8) + 2}.1f}" for column, value in zip(columns, values)))
@@ -0,0 +1,110 @@
+from langchain_text_splitters import CharacterTextSplitter
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
+from concurrent.futures import ProcessPoolExecutor
+import copy
+import os
+import time
+
+SPLITTER_KWARGS = {
+    "separator": "",
+    "chunk_size": 500,
+    "chunk_overlap": 0,
+    "is_separator_regex": False
+}
+MIN_PARALLEL_CHARS = 200_000 # below this the process start up costs more than the split itself
+
+_worker_splitter = None
+
+def _init_worker(splitter_kwargs):
+    # every worker builds its own splitter once, only plain kwargs cross the process boundary
+    global _worker_splitter
+    _worker_splitter = CharacterTextSplitter(**splitter_kwargs)
+
+def _split_shard(texts):
+    # returns (start, end) offsets into each page instead of the chunk strings themselves,
+    # the parent already holds the text so only a few ints travel back per chunk.
+    # Starts are searched like CharacterTextSplitter(add_start_index=True) does, from the end of the previous chunk
+    overlap = _worker_splitter._chunk_overlap
+    shard_offsets = []
+    for text in texts:
+        offsets = []
+        index, previous_len = 0, 0
+        for chunk in _worker_splitter.split_text(text):
+            index = text.find(chunk, max(0, index + previous_len - overlap))
+            previous_len = len(chunk)
+            if index == -1:
+                offsets.append((chunk, -1)) # chunk is not a plain substring (e.g. rejoined separators), ship it as is
+                continue
+            offsets.append((index, index + len(chunk)))
+        shard_offsets.append(offsets)
+    return shard_offsets
+
+def _make_shards(texts, n_shards):
+    # contiguous shards of roughly equal character count so the output order is just the shard order
+    total = sum(len(text) for text in texts)
+    target = total / n_shards
+    shards, current, size = [], [], 0
+    for text in texts:
+        current.append(text)
+        size += len(text)
+        if size >= target and len(shards) < n_shards - 1:
+            shards.append(current)
+            current, size = [], 0
+    if current:
+        shards.append(current)
+    return shards
+
+def parallel_split_documents(docs, splitter_kwargs=SPLITTER_KWARGS, max_workers=None, min_parallel_chars=MIN_PARALLEL_CHARS):
+    max_workers = max_workers or os.cpu_count() or 1
+    texts = [doc.page_content for doc in docs]
+    if max_workers == 1 or len(docs) < 2 or sum(len(text) for text in texts) < min_parallel_chars:
+        return CharacterTextSplitter(**splitter_kwargs).split_documents(docs)
+
+    add_start_index = splitter_kwargs.get("add_start_index", False)
+    shards = _make_shards(texts, max_workers * 4) # a few shards per worker smooths out uneven pages
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(splitter_kwargs,)) as executor:
+        shard_results = executor.map(_split_shard, shards)
+
+        result = []
+        doc_iter = iter(docs)
+        for shard_offsets in shard_results:
+            for offsets in shard_offsets:
+                doc = next(doc_iter)
+                for item in offsets:
+                    metadata = copy.deepcopy(doc.metadata)
+                    if isinstance(item[0], str):
+                        page_content, start = item
+                    else:
+                        page_content = doc.page_content[item[0]:item[1]]
+                        start = item[0]
+                    if add_start_index:
+                        metadata["start_index"] = start
+                    result.append(Document(page_content=page_content, metadata=metadata))
+    return result
+
+if __name__ == "__main__": # required for process pools on Windows (spawn start method)
+    loader = PyPDFLoader(r"C:\Users\sj282\OneDrive\Desktop\SJ\AI Agents\LangChain\text_splitters\test_document.pdf")
+    docs = loader.load()
+
+    result = parallel_split_documents(docs)
+    print(result[0])
+
+    # ---------------------------------- Scaling by core count ----------------------------------
+    # the sample pdf is only a few pages, so replicate it to look like a large corpus
+
+    corpus = docs * 2000
+    serial_start = time.perf_counter()
+    serial_result = CharacterTextSplitter(**SPLITTER_KWARGS).split_documents(corpus)
+    serial_time = time.perf_counter() - serial_start
+    print(f"pages: {len(corpus)}, chunks: {len(serial_result)}")
+    print(f"serial   : {serial_time:.2f}s")
+
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        start = time.perf_counter()
+        parallel_result = parallel_split_documents(corpus, max_workers=workers, min_parallel_chars=0)
+        elapsed = time.perf_counter() - start
+        assert [d.page_content for d in parallel_result] == [d.page_content for d in serial_result]
+        print(f"workers {workers:>2}: {elapsed:.2f}s speedup x{serial_time / elapsed:.2f}")
+        workers *= 2
@@ -4,13 +4,16 @@ from langchain_core.messages import HumanMessage
 from typing import Annotated
 from langchain_core.tools import tool
 from dotenv import load_dotenv
-import requests
-import json
+from took_calling.exchange_rates import ExchangeRateProvider
+from took_calling.tool_executor import ToolExecutor
 import os 
 
+from tools.tool_cache import bind_tools
+
 load_dotenv()
 
 api_key = os.getenv("Exchange_rate_api_key")
+rates = ExchangeRateProvider(api_key) # one /latest/{base} request serves every pair with that base for an hour
 
 @tool
 def get_conversion_factor(base_currency:str, target_currency:str)->float:
@@ -23,9 +26,7 @@ def get_conversion_factor(base_currency:str, target_currency:str)->float:
     Returns:
         float: The conversion factor between the base and the target currency.
     """
-    url = f"https://v6.exchangerate-api.com/v6/{api_key}/pair/{base_currency}/{target_currency}"
-    result = requests.get(url)
-    return result.json()
+    return rates.pair(base_currency, target_currency)
 
 
 @tool
@@ -45,7 +46,7 @@ model = ChatGoogleGenerativeAI(
     model="gemini-2.5-flash"
 )
 
-model_with_tools = model.bind_tools([get_conversion_factor,convert])
+model_with_tools = bind_tools(model, [get_conversion_factor,convert])
 
 messages = [HumanMessage(input("User: "))]
 
@@ -53,15 +54,13 @@ ai_message = model_with_tools.invoke(messages)
 
 messages.append(ai_message)
 
-for tool_call in ai_message.tool_calls:
-    if tool_call["name"]=="get_conversion_factor":
-        tool_message_1 = get_conversion_factor.invoke(tool_call)
-        conversion_rate = json.loads(tool_message_1.content)["conversion_rate"]
-        messages.append(tool_message_1)
-    elif tool_call["name"]=="convert":
-        tool_call["args"]["conversion_rate"] = conversion_rate
-        tool_message_2 = convert.invoke(tool_call)
-        messages.append(tool_message_2)
+# independent calls run concurrently, each convert call waits for its own get_conversion_factor call
+executor = ToolExecutor(
+    [get_conversion_factor, convert],
+    dependencies={"convert": {"rate": ("get_conversion_factor", lambda result: result["conversion_rate"])}},
+    timeouts={"get_conversion_factor": 15},
+)
+messages.extend(executor.invoke(ai_message))
 
 final_result = model_with_tools.invoke(messages)
 print("AI: ",final_result.content)
\ No newline at end of file
@@ -0,0 +1,179 @@
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import requests
+import threading
+import time
+
+class ExchangeRateProvider:
+    """Conversion rates from the ExchangeRate API with one request per base currency instead of one per pair.
+
+    `/latest/{base}` returns the rates from `base` to every supported currency, the table is kept for
+    `ttl` seconds (the API itself refreshes once a day on the free plan). A pair whose base has no table
+    yet is derived from any cached table that lists both currencies, e.g. EUR -> INR from the USD table as
+    USD->INR / USD->EUR, so a conversation about USD, EUR and INR needs a single request. All requests go
+    through one pooled session with connect/read timeouts and retries on 429 and 5xx. When a refresh fails
+    the expired table is used for up to `max_stale` more seconds rather than failing the tool call."""
+
+    def __init__(self, api_key, base_url="https://v6.exchangerate-api.com/v6", ttl=3600, max_stale=86400,
+                 timeout=(3.05, 10), pool_size=4):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=Retry(
+            total=2, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",)
+        ))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.tables = {} # base -> (fetched at, {currency: rate})
+        self.stats = {"http_calls": 0, "conversions": 0, "cached": 0, "cross": 0, "stale": 0}
+        self._lock = threading.Lock()
+        self._fetching = {} # base -> lock, so concurrent tool calls for one base share a request
+
+    @property
+    def calls_per_conversion(self):
+        return self.stats["http_calls"] / max(self.stats["conversions"], 1)
+
+    def _fresh(self, base, now):
+        entry = self.tables.get(base)
+        return entry is not None and now - entry[0] < self.ttl
+
+    def _fetch(self, base):
+        with self._lock:
+            self.stats["http_calls"] += 1
+        response = self.session.get(f"{self.base_url}/{self.api_key}/latest/{base}", timeout=self.timeout)
+        response.raise_for_status()
+        body = response.json()
+        if body.get("result") != "success":
+            raise ValueError(f"Exchange rate lookup for {base} failed: {body.get('error-type', body)}")
+        return body["conversion_rates"]
+
+    def table(self, base):
+        """The rates from `base` to every currency, fetched at most once per `ttl`."""
+        base = base.upper()
+        if self._fresh(base, time.monotonic()):
+            return self.tables[base][1]
+        with self._lock:
+            fetch_lock = self._fetching.setdefault(base, threading.Lock())
+        with fetch_lock:
+            now = time.monotonic()
+            if self._fresh(base, now): # another thread fetched it while this one waited
+                return self.tables[base][1]
+            try:
+                rates = self._fetch(base)
+            except requests.RequestException:
+                entry = self.tables.get(base)
+                if entry is None or now - entry[0] > self.ttl + self.max_stale:
+                    raise
+                with self._lock:
+                    self.stats["stale"] += 1
+                return entry[1]
+            self.tables[base] = (time.monotonic(), rates)
+            return rates
+
+    def _cross_rate(self, base, target, now):
+        for fetched, rates in list(self.tables.values()):
+            if now - fetched < self.ttl and base in rates and target in rates:
+                return rates[target] / rates[base]
+        return None
+
+    def rate(self, base, target):
+        """How many `target` one unit of `base` is worth."""
+        base, target = base.upper(), target.upper()
+        now = time.monotonic()
+        kind = "cached"
+        if base == target:
+            rate = 1.0
+        elif self._fresh(base, now):
+            rate = self.tables[base][1].get(target)
+        else:
+            rate = self._cross_rate(base, target, now)
+            kind = "cross"
+            if rate is None:
+                rate = self.table(base).get(target)
+                kind = None
+        if rate is None:
+            raise ValueError(f"No exchange rate from {base} to {target}")
+        with self._lock:
+            self.stats["conversions"] += 1
+            if kind:
+                self.stats[kind] += 1
+        return rate
+
+    def pair(self, base, target):
+        """The `/pair/{base}/{target}` response body, answered from the cached tables."""
+        return {"result": "success", "base_code": base.upper(), "target_code": target.upper(),
+                "conversion_rate": self.rate(base, target)}
+
+if __name__ == "__main__":
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    import json
+    import random
+
+    usd = {"USD": 1.0, "EUR": 0.92, "GBP": 0.79, "INR": 83.2, "JPY": 151.4, "AUD": 1.52, "CAD": 1.36, "CHF": 0.88}
+    served = {"requests": 0}
+
+    class StandInRateServer(BaseHTTPRequestHandler):
+        # local stand-in for v6.exchangerate-api.com: /v6/<key>/latest/<base> and /v6/<key>/pair/<base>/<target>,
+        # with 30ms of latency per request like a nearby API
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            served["requests"] += 1
+            time.sleep(0.03)
+            parts = self.path.strip("/").split("/")[2:] # after /v6/<key>
+            if len(parts) == 2 and parts[0] == "latest" and parts[1] in usd:
+                base = usd[parts[1]]
+                body = {"result": "success", "base_code": parts[1],
+                        "conversion_rates": {code: rate / base for code, rate in usd.items()}}
+            elif len(parts) == 3 and parts[0] == "pair" and parts[1] in usd and parts[2] in usd:
+                body = {"result": "success", "base_code": parts[1], "target_code": parts[2],
+                        "conversion_rate": usd[parts[2]] / usd[parts[1]]}
+            else:
+                body = {"result": "error", "error-type": "unsupported-code"}
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInRateServer)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v6"
+
+    rng = random.Random(3)
+    conversions = [tuple(rng.sample(["USD", "EUR", "INR", "GBP", "JPY"], 2)) for _ in range(200)]
+
+    served["requests"] = 0
+    start = time.perf_counter()
+    per_pair = [requests.get(f"{base_url}/key/pair/{base}/{target}").json()["conversion_rate"] for base, target in conversions]
+    elapsed = time.perf_counter() - start
+    print(f"requests.get per pair:  {served['requests']:>4} requests, {served['requests'] / len(conversions):.3f} per conversion, "
+          f"{1000 * elapsed / len(conversions):6.2f}ms per conversion")
+
+    served["requests"] = 0
+    provider = ExchangeRateProvider("key", base_url=base_url)
+    start = time.perf_counter()
+    cached = [provider.pair(base, target)["conversion_rate"] for base, target in conversions]
+    elapsed = time.perf_counter() - start
+    assert all(abs(a - b) < 1e-9 * b for a, b in zip(per_pair, cached))
+    print(f"ExchangeRateProvider:   {served['requests']:>4} requests, {provider.calls_per_conversion:.3f} per conversion, "
+          f"{1000 * elapsed / len(conversions):6.2f}ms per conversion, {provider.stats}")
+
+    provider.ttl = 0 # every table expired: one refresh for the base, then cross rates again
+    served["requests"] = 0
+    provider.rate("EUR", "INR")
+    print(f"after expiry: {served['requests']} request for EUR -> INR")
+
+    server.shutdown()
+    server.server_close()
+    provider.session.close() # drop the kept-alive connection too, its handler thread would still answer
+    provider.ttl = 3600
+    provider.tables = {base: (fetched - 7200, rates) for base, (fetched, rates) in provider.tables.items()}
+    print(f"server down, expired EUR table: EUR -> INR = {provider.rate('EUR', 'INR'):.2f} (stale served {provider.stats['stale']} times)")
@@ -2,6 +2,9 @@ from langchain_core.tools import tool
 from langchain_core.messages import HumanMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
+from took_calling.tool_executor import ToolExecutor
+
+from tools.tool_cache import bind_tools
 
 
 load_dotenv()
@@ -29,7 +32,7 @@ messages = [query]
 
 #Tool Binding
 
-model_with_tool = model.bind_tools([multiply])
+model_with_tool = bind_tools(model, [multiply])
 
 result_ai = model_with_tool.invoke(messages)
 
@@ -37,9 +40,7 @@ messages.append(result_ai)
 
 #Tool Execution
 
-result_tool = multiply.invoke(result_ai.tool_calls[0])
-
-messages.append(result_tool)
+messages.extend(ToolExecutor([multiply]).invoke(result_ai))
 
 final_result = model_with_tool.invoke(messages)
 
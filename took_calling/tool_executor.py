@@ -0,0 +1,240 @@
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import Runnable
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from functools import partial
+import asyncio
+import json
+
+def _output(message):
+    # what a dependent call receives: the artifact when the tool returns one, else the decoded content
+    if message.artifact is not None:
+        return message.artifact
+    try:
+        return json.loads(message.content)
+    except (TypeError, ValueError):
+        return message.content
+
+class ToolExecutor(Runnable):
+    """Runs the tool calls of an AIMessage concurrently and returns their ToolMessages in call order.
+
+    Sync tools run on a thread pool, tools with a coroutine run on the event loop, so a turn takes as long as
+    its slowest chain of calls instead of the sum of all of them. `dependencies` fills InjectedToolArg values
+    from the output of other calls in the same turn, e.g.
+    {"convert": {"rate": ("get_conversion_factor", lambda output: output["conversion_rate"])}}: the n-th convert
+    call waits for the n-th get_conversion_factor call (or the last one, if there are fewer) and gets its
+    conversion_rate as `rate`. Each call is limited to `timeouts[name]` or `default_timeout` seconds. Errors,
+    timeouts and calls whose dependency failed come back as ToolMessages with status="error", the model sees
+    them on the next turn instead of the loop crashing."""
+
+    def __init__(self, tools, dependencies=None, timeouts=None, default_timeout=30, max_workers=8):
+        self.tools = {tool.name: tool for tool in tools}
+        self.dependencies = dependencies or {}
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self.max_workers = max_workers
+        self._pool = None
+        for name, args in self.dependencies.items():
+            tool = self.tools[name]
+            injected = set(tool.get_input_schema().model_fields) - set(tool.tool_call_schema.model_fields)
+            for arg, (source, _) in args.items():
+                if arg not in injected:
+                    raise ValueError(f"{name}.{arg} is not an InjectedToolArg, the model fills it")
+                if source not in self.tools:
+                    raise ValueError(f"{name}.{arg} depends on unknown tool {source}")
+        self._check_cycles()
+
+    def _check_cycles(self):
+        done, visiting = set(), set()
+        def visit(name):
+            if name in visiting:
+                raise ValueError(f"Tool dependencies form a cycle through {name}")
+            if name not in done:
+                visiting.add(name)
+                for source, _ in self.dependencies.get(name, {}).values():
+                    visit(source)
+                visiting.discard(name)
+                done.add(name)
+        for name in self.dependencies:
+            visit(name)
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tool")
+        return self._pool
+
+    @staticmethod
+    def _tool_calls(input):
+        if isinstance(input, list): # the message history, the calls are in its last AIMessage
+            input = next(message for message in reversed(input) if isinstance(message, AIMessage))
+        return input.tool_calls if isinstance(input, AIMessage) else input
+
+    def _error(self, call, text):
+        return ToolMessage(content=text, name=call["name"], tool_call_id=call["id"], status="error")
+
+    def _sources(self, calls):
+        """For every call, the calls its injected arguments come from: {index: {arg: (source index, extract)}}."""
+        positions = {}
+        for index, call in enumerate(calls):
+            positions.setdefault(call["name"], []).append(index)
+        sources = {}
+        for name, indices in positions.items():
+            for nth, index in enumerate(indices):
+                for arg, (source, extract) in self.dependencies.get(name, {}).items():
+                    candidates = positions.get(source)
+                    sources.setdefault(index, {})[arg] = (candidates[min(nth, len(candidates) - 1)] if candidates else None, extract)
+        return sources
+
+    async def _run(self, tool, call, config):
+        if getattr(tool, "coroutine", None) is not None:
+            return await tool.ainvoke(call, config)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, partial(copy_context().run, tool.invoke, call, config))
+
+    async def _execute(self, calls, config):
+        sources = self._sources(calls)
+        tasks = {}
+
+        async def run(index):
+            call = calls[index]
+            tool = self.tools.get(call["name"])
+            if tool is None:
+                return self._error(call, f"Error: unknown tool {call['name']}, available: {', '.join(self.tools)}")
+            args = dict(call["args"])
+            for arg, (source, extract) in sources.get(index, {}).items():
+                if source is None:
+                    return self._error(call, f"Error: {arg} needs a {self.dependencies[call['name']][arg][0]} call in the same turn")
+                result = await tasks[source]
+                if result.status == "error":
+                    return self._error(call, f"Error: skipped, {calls[source]['name']} failed: {result.content}")
+                try:
+                    args[arg] = extract(_output(result))
+                except Exception as e:
+                    return self._error(call, f"Error: could not read {arg} from {calls[source]['name']}: {e!r}")
+            timeout = self.timeouts.get(call["name"], self.default_timeout)
+            try:
+                return await asyncio.wait_for(self._run(tool, {**call, "args": args}, config), timeout)
+            except asyncio.TimeoutError:
+                # a sync tool keeps its thread until it returns, only the turn stops waiting for it
+                return self._error(call, f"Error: {call['name']} timed out after {timeout}s")
+            except Exception as e:
+                return self._error(call, f"Error: {e!r}")
+
+        for index in range(len(calls)):
+            tasks[index] = asyncio.ensure_future(run(index))
+        return list(await asyncio.gather(*tasks.values()))
+
+    async def _aexecute(self, calls, config):
+        # `config` is the child config of the ToolExecutor run, so the tool runs are traced under it
+        return await self._execute(calls, config)
+
+    def _run_sync(self, calls, config):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self._execute(calls, config))
+        # invoked from a running event loop (a sync tool of an async agent, a notebook): the calls get their
+        # own loop on a helper thread, the caller's loop is blocked like for any sync invoke
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="tool-loop") as runner:
+            return runner.submit(copy_context().run, lambda: asyncio.run(self._execute(calls, config))).result()
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return await self._acall_with_config(self._aexecute, self._tool_calls(input), config)
+
+    def invoke(self, input, config=None, **kwargs):
+        """The ToolMessages for an AIMessage (or a message list ending in one). From async code prefer `ainvoke`."""
+        return self._call_with_config(self._run_sync, self._tool_calls(input), config)
+
+if __name__ == "__main__":
+    from langchain_core.callbacks import BaseCallbackHandler
+    from langchain_core.tools import InjectedToolArg, tool
+    from typing import Annotated
+    import time
+
+    rates = {("USD", "INR"): 83.2, ("EUR", "GBP"): 0.86}
+
+    @tool
+    def get_conversion_factor(base_currency: str, target_currency: str) -> dict:
+        """Conversion rate between two currencies."""
+        time.sleep(0.3) # a slow rate API
+        return {"conversion_rate": rates[base_currency, target_currency]}
+
+    @tool
+    def convert(amount: int, rate: Annotated[float, InjectedToolArg]) -> float:
+        """Amount times the conversion rate."""
+        return amount * rate
+
+    @tool
+    async def get_news(topic: str) -> str:
+        """Latest headline about a topic."""
+        await asyncio.sleep(0.3)
+        return f"Markets calm ahead of {topic} data"
+
+    @tool
+    def get_history(currency: str) -> str:
+        """A year of rates, very slow."""
+        time.sleep(2)
+        return "..."
+
+    def call(index, name, **args):
+        return {"name": name, "args": args, "id": f"call_{index}", "type": "tool_call"}
+
+    ai_message = AIMessage(content="", tool_calls=[
+        call(1, "get_conversion_factor", base_currency="USD", target_currency="INR"),
+        call(2, "get_conversion_factor", base_currency="EUR", target_currency="GBP"),
+        call(3, "convert", amount=100),
+        call(4, "convert", amount=50),
+        call(5, "get_news", topic="inflation"),
+        call(6, "get_history", currency="INR"),
+    ])
+    executor = ToolExecutor(
+        [get_conversion_factor, convert, get_news, get_history],
+        dependencies={"convert": {"rate": ("get_conversion_factor", lambda output: output["conversion_rate"])}},
+        timeouts={"get_history": 0.5},
+    )
+
+    start = time.perf_counter()
+    sequential, conversion_rate = [], None # the loop currency_converter.py had
+    for tool_call in ai_message.tool_calls:
+        if tool_call["name"] == "get_conversion_factor":
+            message = get_conversion_factor.invoke(tool_call)
+            conversion_rate = json.loads(message.content)["conversion_rate"]
+        elif tool_call["name"] == "convert":
+            tool_call = {**tool_call, "args": {**tool_call["args"], "rate": conversion_rate}}
+            message = convert.invoke(tool_call)
+        elif tool_call["name"] == "get_news":
+            message = asyncio.run(get_news.ainvoke(tool_call))
+        else:
+            continue # would block for 2s
+        sequential.append(message)
+    print(f"sequential loop (get_history left out): {1000 * (time.perf_counter() - start):6.0f}ms, "
+          f"converts {[m.content for m in sequential if m.name == 'convert']} (both use the last rate)")
+
+    start = time.perf_counter()
+    messages = executor.invoke(ai_message)
+    print(f"ToolExecutor:                           {1000 * (time.perf_counter() - start):6.0f}ms (bounded by the 0.5s get_history timeout)")
+    for message in messages:
+        print(f"  {message.tool_call_id} {message.name:<22} {message.status:<8} {message.content}")
+
+    class RunTree(BaseCallbackHandler):
+        def __init__(self):
+            self.parents = {}
+
+        def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+            self.parents[run_id] = ("chain", parent_run_id)
+
+        def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+            self.parents[run_id] = ("tool", parent_run_id)
+
+    quick = ToolExecutor([get_news, convert], dependencies={})
+    tree = RunTree()
+    quick.invoke(AIMessage(content="", tool_calls=[call(1, "get_news", topic="rates")]), {"callbacks": [tree]})
+    executor_run = next(run_id for run_id, (kind, parent) in tree.parents.items() if kind == "chain" and parent is None)
+    assert [parent for kind, parent in tree.parents.values() if kind == "tool"] == [executor_run] # children, not siblings
+
+    async def from_a_running_loop():
+        return quick.invoke(AIMessage(content="", tool_calls=[call(1, "get_news", topic="rates")]))
+    assert asyncio.run(from_a_running_loop())[0].status == "success"
+    print("tool runs are children of the ToolExecutor run, invoke works inside a running event loop")
+    executor.pool.shutdown(wait=False)
@@ -1,6 +1,7 @@
 from langchain_core.tools import BaseTool
 from typing import Type
 from pydantic import BaseModel, Field
+from tools.tool_cache import pure
 
 class MultiplyInput(BaseModel):
     a:int=Field(description="First number to multiple",required=True)
@@ -13,7 +14,7 @@ class Multiply(BaseTool):
     def _run(self,a:int,b:int)->int:
         return a*b
     
-multiply_tool = Multiply()
+multiply_tool = pure(Multiply())
 result = multiply_tool.invoke({"a":3,"b":5})
 print(result)
 print(multiply_tool.name)
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from langchain_core.tools import StructuredTool
+from tools.tool_cache import pure
 
 class MultiplyInput(BaseModel):
     a:int=Field(description="First number to multiple",required=True)
@@ -17,12 +18,12 @@ def multiply(a:int,b:int)->int:
     """
     return a*b
 
-multiply_tool = StructuredTool.from_function(
+multiply_tool = pure(StructuredTool.from_function(
     func=multiply,
     name="Multiply",
     description="Multiply Two numbers",
     args_schema=MultiplyInput
-)
+))
 
 result = multiply_tool.invoke({"a":3,"b":5})
 print(result)
@@ -0,0 +1,255 @@
+from langchain_core.tools import BaseTool
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables.config import run_in_executor
+from pydantic import BaseModel, PrivateAttr, ValidationError
+from collections import OrderedDict
+import threading
+
+from structured_output.schema_cache import tool_schema
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, BaseModel):
+        return _freeze(value.model_dump())
+    return value.__class__, value # 1, 1.0 and True are equal as keys but not as arguments
+
+class _LRU:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            if key in self.results:
+                self.results.move_to_end(key)
+                self.hits += 1
+                return True, self.results[key]
+        return False, None
+
+    def put(self, keys, result, miss=False):
+        with self.lock:
+            self.misses += miss
+            for key in keys:
+                self.results[key] = result
+            while len(self.results) > self.maxsize:
+                self.results.popitem(last=False)
+
+class PureTool(BaseTool):
+    """A tool whose result only depends on its arguments (multiply, add, lookups in static data), with its
+    recent results kept in an LRU of `maxsize` entries.
+
+    Results are keyed on the validated arguments, so {"a": "3", "b": 5} and {"a": 3, "b": 5} share a result.
+    The raw arguments get an entry too: a call repeating earlier arguments is answered before validation, skipping the
+    args_schema and the tool's callback run. Hits are not traced, misses run the wrapped tool as usual.
+    A tool call is passed to the wrapped tool as it is and its ToolMessage returned unchanged, only a message with
+    status "success" is kept; plain arguments are kept only when the tool raises its errors instead of returning them.
+    Name, description and args_schema are the wrapped tool's, so binding it to a model is unchanged."""
+
+    tool: BaseTool
+    maxsize: int = 1024
+    _memo: _LRU = PrivateAttr() # one private attribute, pydantic's lookup of those costs microseconds each
+
+    def __init__(self, tool, maxsize=1024, **kwargs):
+        if tool.response_format != "content":
+            raise ValueError(f"{tool.name} returns an artifact, only plain content results are memoized")
+        super().__init__(tool=tool, maxsize=maxsize, name=tool.name, description=tool.description,
+                         args_schema=tool.args_schema, return_direct=tool.return_direct, **kwargs)
+        self._memo = _LRU(maxsize)
+
+    @property
+    def stats(self):
+        memo = self._memo
+        return {"hits": memo.hits, "misses": memo.misses, "size": len(memo.results)}
+
+    def cache_clear(self):
+        with self._memo.lock:
+            self._memo.results.clear()
+
+    @staticmethod
+    def _raw_key(args):
+        key = ("raw", _freeze(args))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def _validated_key(self, args):
+        schema = self.tool.args_schema
+        if not isinstance(args, dict) or not (isinstance(schema, type) and issubclass(schema, BaseModel)):
+            return None
+        try:
+            return ("args", _freeze(schema.model_validate(args).model_dump()))
+        except ValidationError:
+            return None # the wrapped tool reports it, through its handle_validation_error
+
+    def _lookup(self, memo, input):
+        """Checks the raw arguments first, then validates them and checks again. Returns whether the input
+        was a tool call, its arguments, the cached result if any, and the keys to store a new result under.
+        Tool calls keep their message content and plain calls the tool's output, so each has its own keys."""
+        is_call = isinstance(input, dict) and input.get("type") == "tool_call"
+        args = input["args"] if is_call else input
+        raw = self._raw_key(args)
+        raw = None if raw is None else (is_call, raw)
+        found, result = memo.get(raw) if raw is not None else (False, None)
+        if found:
+            return is_call, args, True, result, []
+        validated = self._validated_key(args)
+        validated = None if validated is None else (is_call, validated)
+        found, result = memo.get(validated) if validated is not None else (False, None)
+        keys = [key for key in (raw, validated) if key is not None]
+        if found:
+            memo.put(keys[:1] if raw is not None else [], result) # the next identical call skips validation
+        return is_call, args, found, result, keys
+
+    def _message(self, input, content):
+        return ToolMessage(content=content, name=self.name, tool_call_id=input["id"], status="success")
+
+    def _keep(self, memo, keys, is_call, result):
+        """Stores a miss. A handled error comes back as a message with status "error", or for plain arguments as
+        the tool's ordinary output, so those are not kept and the next call runs the tool again."""
+        if is_call:
+            if result.status == "success":
+                memo.put(keys, result.content, miss=True)
+                return
+        elif not (self.tool.handle_tool_error or self.tool.handle_validation_error):
+            memo.put(keys, result, miss=True)
+            return
+        memo.put([], None, miss=True)
+
+    def invoke(self, input, config=None, **kwargs):
+        memo = self._memo
+        is_call, args, found, result, keys = self._lookup(memo, input)
+        if found:
+            return self._message(input, result) if is_call else result
+        result = self.tool.invoke(input, config, **kwargs)
+        self._keep(memo, keys, is_call, result)
+        return result
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        memo = self._memo
+        is_call, args, found, result, keys = self._lookup(memo, input)
+        if found:
+            return self._message(input, result) if is_call else result
+        result = await self.tool.ainvoke(input, config, **kwargs)
+        self._keep(memo, keys, is_call, result)
+        return result
+
+    def _run(self, *args, **kwargs):
+        return self.tool._run(*args, **kwargs)
+
+    async def _arun(self, *args, **kwargs):
+        return await run_in_executor(None, self._run, *args, **kwargs)
+
+def pure(tool=None, *, maxsize=1024):
+    """Marks a tool as pure, as `pure(tool)`, `@pure` or `@pure(maxsize=...)` above `@tool`."""
+    if tool is None:
+        return lambda tool: PureTool(tool, maxsize=maxsize)
+    return PureTool(tool, maxsize=maxsize)
+
+_bound = _LRU(maxsize=64)
+_lock = threading.Lock()
+
+def bind_tools(model, tools, **kwargs):
+    """`model.bind_tools(tools, **kwargs)` with every tool converted once per process, and the bound model
+    built once per model, toolset and arguments (the last 64 combinations are kept). The model receives the
+    cached OpenAI tool dicts, which every provider's bind_tools accepts as they are."""
+    tools = tuple(tools)
+    key = (id(model), tuple(map(id, tools)), tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+    found, entry = _bound.get(key)
+    if not found:
+        with _lock:
+            found, entry = _bound.get(key)
+            if not found:
+                # the model and tools are kept in the entry, so their ids are not reused while it exists
+                entry = (model.bind_tools([tool_schema(tool) for tool in tools], **kwargs), model, tools)
+                _bound.put([key], entry, miss=True)
+    return entry[0]
+
+if __name__ == "__main__":
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.outputs import ChatGeneration, ChatResult
+    from langchain_core.messages import AIMessage
+    from langchain_core.tools import StructuredTool, ToolException, tool
+    from langchain_core.utils.function_calling import convert_to_openai_tool
+    from pydantic import Field, create_model
+    import time
+
+    def per_call(call, runs):
+        start = time.perf_counter()
+        for _ in range(runs):
+            call()
+        return 1e6 * (time.perf_counter() - start) / runs
+
+    @tool
+    def multiply(a:int,b:int)->int:
+        """Function to multiply two numbers
+
+        Args:
+            a (int): first number
+            b (int): second number
+
+        Returns:
+            int: product of two numbers
+        """
+        return a*b
+
+    pure_multiply = pure(multiply)
+    calls = [{"a": i % 50, "b": 7} for i in range(20_000)] # 50 distinct questions asked over and over
+    call_iter = iter(calls * 2)
+    plain = per_call(lambda: multiply.invoke(next(call_iter)), len(calls))
+    call_iter = iter(calls)
+    cached = per_call(lambda: pure_multiply.invoke(next(call_iter)), len(calls))
+    validate = per_call(lambda: multiply.args_schema.model_validate({"a": 3, "b": 7}), len(calls))
+    print(f"multiply.invoke {plain:.1f}us, pure {cached:.2f}us, args_schema validation alone {validate:.2f}us, "
+          f"{pure_multiply.stats}")
+
+    lenient = pure(multiply.model_copy(update={"handle_validation_error": True}))
+    message = lenient.invoke({"name": "multiply", "args": {"a": "three", "b": 7}, "id": "call_1", "type": "tool_call"})
+    assert message.status == "error" and message.content.startswith("Tool input validation error"), message
+    message = lenient.invoke({"name": "multiply", "args": {"a": 3, "b": 7}, "id": "call_2", "type": "tool_call"})
+    assert (message.status, message.content, message.tool_call_id) == ("success", "21", "call_2"), message
+    message = lenient.invoke({"name": "multiply", "args": {"a": 3, "b": 7}, "id": "call_3", "type": "tool_call"})
+    assert (message.status, message.content, message.tool_call_id) == ("success", "21", "call_3"), message
+    assert lenient.stats == {"hits": 1, "misses": 2, "size": 2}, lenient.stats # the error was not kept
+
+    @tool
+    def divide(a:float,b:float)->float:
+        """Divides a by b"""
+        if b == 0:
+            raise ToolException("division by zero")
+        return a/b
+
+    pure_divide = pure(divide.model_copy(update={"handle_tool_error": True}))
+    for call_id in ("call_4", "call_5"):
+        message = pure_divide.invoke({"name": "divide", "args": {"a": 1, "b": 0}, "id": call_id, "type": "tool_call"})
+        assert (message.status, message.content) == ("error", "division by zero"), message
+    assert pure_divide.invoke({"a": 1, "b": 0}) == "division by zero"
+    assert pure_divide.stats == {"hits": 0, "misses": 3, "size": 0}, pure_divide.stats # each call ran the tool
+
+    class FakeToolCallingModel(BaseChatModel):
+        # local stand-in for a provider: bind_tools converts every tool like the real integrations do
+        @property
+        def _llm_type(self):
+            return "fake-tool-calling"
+
+        def bind_tools(self, tools, tool_choice=None, **kwargs):
+            return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], tool_choice=tool_choice, **kwargs)
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=""))])
+
+    model = FakeToolCallingModel()
+    for size in (2, 20, 100):
+        toolkit = [StructuredTool.from_function(
+            func=lambda **kwargs: 0, name=f"tool_{i}", description=f"Tool number {i}",
+            args_schema=create_model(f"Tool{i}Input", **{f"field_{j}": (int, Field(description=f"Field {j}")) for j in range(5)}),
+        ) for i in range(size)]
+        assert bind_tools(model, toolkit).kwargs["tools"] == model.bind_tools(toolkit).kwargs["tools"]
+        print(f"bind_tools, {size:>3} tools: model.bind_tools {per_call(lambda: model.bind_tools(toolkit), 50):9.1f}us, "
+              f"cached {per_call(lambda: bind_tools(model, toolkit), 2000):6.1f}us")
@@ -1,5 +1,7 @@
 from langchain_core.tools import tool
+from tools.tool_cache import pure
 
+@pure
 @tool
 def multiply(a:int,b:int)->int:
     """Function to multiply two numbers
@@ -13,6 +15,7 @@ def multiply(a:int,b:int)->int:
     """
     return a*b
 
+@pure
 @tool
 def add(a:int,b:int)->int:
     """Function to add two numbers
@@ -1,5 +1,7 @@
 from langchain_core.tools import tool
+from tools.tool_cache import pure
 
+@pure # same a and b, same answer: results are memoized
 @tool
 def multiply(a:int,b:int)->int:
     """Function to multiply two numbers
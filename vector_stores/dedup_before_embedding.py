@@ -0,0 +1,136 @@
+from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_huggingface import HuggingFaceEndpointEmbeddings
+from langchain_chroma import Chroma
+from dotenv import load_dotenv
+import hashlib
+import random
+import re
+
+load_dotenv()
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+class MinHashDeduplicator:
+    # MinHash signatures over word shingles + LSH banding, so only chunks sharing a band bucket are compared
+
+    def __init__(self, threshold=0.8, num_perm=128, shingle_size=5, seed=42):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = self._optimal_bands(threshold, num_perm)
+        rng = random.Random(seed)
+        self.permutations = [
+            (rng.randint(1, MERSENNE_PRIME - 1), rng.randint(0, MERSENNE_PRIME - 1))
+            for _ in range(num_perm)
+        ]
+
+    @staticmethod
+    def _optimal_bands(threshold, num_perm):
+        # pick bands*rows == num_perm whose S-curve midpoint (1/b)^(1/r) is closest to the threshold
+        options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+        return min(options, key=lambda option: abs((1 / option[0]) ** (1 / option[1]) - threshold))
+
+    def _shingles(self, text):
+        words = re.findall(r"\w+", text.lower())
+        if len(words) <= self.shingle_size:
+            return {" ".join(words)}
+        return {" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+
+    def signature(self, text):
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little") & MAX_HASH
+            for shingle in self._shingles(text)
+        ]
+        return [min((a * h + b) % MERSENNE_PRIME for h in hashes) & MAX_HASH for a, b in self.permutations]
+
+    @staticmethod
+    def similarity(sig_a, sig_b):
+        return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+    def deduplicate(self, docs):
+        """Returns (kept_docs, provenance) where provenance maps the position of every kept
+        document to the metadata of the near-duplicates that were merged into it."""
+        buckets = {}
+        signatures = []
+        kept = []
+        provenance = {}
+        for doc in docs:
+            sig = self.signature(doc.page_content)
+            band_keys = [(band, tuple(sig[band * self.rows:(band + 1) * self.rows])) for band in range(self.bands)]
+
+            match = None
+            for key in band_keys:
+                for candidate in buckets.get(key, []):
+                    if self.similarity(sig, signatures[candidate]) >= self.threshold:
+                        match = candidate
+                        break
+                if match is not None:
+                    break
+
+            if match is None:
+                position = len(kept)
+                kept.append(doc)
+                signatures.append(sig)
+                provenance[position] = []
+                for key in band_keys:
+                    buckets.setdefault(key, []).append(position)
+            else:
+                provenance[match].append(dict(doc.metadata))
+                kept[match].metadata["duplicate_count"] = len(provenance[match])
+        return kept, provenance
+
+loader = DirectoryLoader(
+    path=r"C:\Users\sj282\OneDrive\Desktop\SJ\AI Agents\LangChain\document_loader\befa_notes",
+    loader_cls=PyPDFLoader,
+    glob="*.pdf"
+)
+docs = loader.load()
+
+splitter = RecursiveCharacterTextSplitter(
+    chunk_size=500,
+    chunk_overlap=100,
+    add_start_index=True
+)
+chunks = splitter.split_documents(docs)
+
+deduplicator = MinHashDeduplicator(threshold=0.8)
+unique_chunks, provenance = deduplicator.deduplicate(chunks)
+
+# ---------------------------------- Report ----------------------------------
+
+embedding_dim = 1024 # BAAI/bge-m3
+embed_batch_size = 32 # texts per request sent by HuggingFaceEndpointEmbeddings
+
+def index_size(chunk_list):
+    # float32 vectors + stored text, a lower bound for what Chroma keeps on disk
+    return sum(embedding_dim * 4 + len(chunk.page_content.encode("utf-8")) for chunk in chunk_list)
+
+calls_before = -(-len(chunks) // embed_batch_size)
+calls_after = -(-len(unique_chunks) // embed_batch_size)
+size_before = index_size(chunks)
+size_after = index_size(unique_chunks)
+
+print(f"LSH bands x rows: {deduplicator.bands} x {deduplicator.rows}")
+print(f"chunks: {len(chunks)} -> {len(unique_chunks)} ({len(chunks) - len(unique_chunks)} near-duplicates merged)")
+print(f"texts embedded saved: {len(chunks) - len(unique_chunks)}, embedding requests: {calls_before} -> {calls_after}")
+print(f"index size: {size_before / 1e6:.2f} MB -> {size_after / 1e6:.2f} MB ({100 * (1 - size_after / size_before):.1f}% smaller)")
+
+for position, duplicates in provenance.items():
+    if duplicates:
+        print("Kept:", unique_chunks[position].metadata, "Merged:", duplicates)
+        break
+
+# ---------------------------------- Embed only the unique chunks ----------------------------------
+# good to comment during reruns to avoid storing data again in the database
+
+embeddings = HuggingFaceEndpointEmbeddings(
+    repo_id="BAAI/bge-m3"
+)
+vector_store = Chroma(
+    collection_name="befa_notes",
+    embedding_function=embeddings,
+    persist_directory="chroma_db"
+)
+# vector_store.add_documents(unique_chunks)